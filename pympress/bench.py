@@ -0,0 +1,346 @@
+#       bench.py
+#
+#       Copyright 2014 Julien Enselme <jujens@jujens.eu>
+#
+#       This program is free software; you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation; either version 2 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program; if not, write to the Free Software
+#       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#       MA 02110-1301, USA.
+
+"""
+:mod:`pympress.bench` -- Micro-benchmarks of the document layer
+---------------------------------------------------------------
+
+This module implements the :program:`pympress-bench` command, which measures the
+performance of :mod:`pympress.document` without any display: opening documents,
+building pages, rendering them and looking up links. Results are printed as JSON
+so that they can be compared between versions.
+
+The benchmarked documents are synthetic decks generated locally with Cairo's PDF
+surface, so no external file is needed.
+"""
+
+import getopt
+import json
+import os, os.path
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import cairo
+
+try:
+    from pympress import document
+except ImportError:
+    import document
+
+#: Size of the generated pages, in PDF points (16:9)
+PAGE_SIZE = (640., 360.)
+
+#: Render sizes, in pixels
+RENDER_SIZES = {
+    "projector": (1920, 1080),
+    "preview": (640, 360),
+}
+
+#: Kinds of synthetic decks
+DECK_KINDS = ["vector", "image", "links", "notes"]
+
+
+def draw_vector(cr, rng, width, height):
+    """Draw a page made of many small vector paths."""
+    cr.set_line_width(0.5)
+    for i in range(2000):
+        cr.set_source_rgb(rng.random(), rng.random(), rng.random())
+        cr.move_to(rng.uniform(0, width), rng.uniform(0, height))
+        for j in range(3):
+            cr.curve_to(*[rng.uniform(0, width) if k % 2 == 0 else rng.uniform(0, height)
+                          for k in range(6)])
+        cr.stroke()
+
+
+def draw_image(cr, rng, width, height):
+    """Draw a page made of a large noisy picture, which does not compress."""
+    img_w, img_h = 1024, 576
+    stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, img_w)
+    data = bytearray(rng.randbytes(stride * img_h))
+    img = cairo.ImageSurface.create_for_data(data, cairo.FORMAT_RGB24, img_w, img_h, stride)
+
+    cr.save()
+    cr.scale(width / img_w, height / img_h)
+    cr.set_source_surface(img, 0, 0)
+    cr.paint()
+    cr.restore()
+
+
+def draw_links(cr, rng, width, height, number, nb_pages):
+    """
+    Draw a page covered with a grid of small links, half of them to named
+    destinations and half of them to page numbers.
+    """
+    cr.tag_begin(cairo.TAG_DEST, "name='page%d'" % number)
+    cr.tag_end(cairo.TAG_DEST)
+
+    cr.set_font_size(6)
+    cols, rows = 20, 20
+    cw, ch = width / cols, height / rows
+    for i in range(cols * rows):
+        x, y = (i % cols) * cw, (i // cols) * ch
+        target = rng.randrange(nb_pages)
+        if i % 2:
+            attrs = "dest='page%d'" % target
+        else:
+            attrs = "page=%d" % (target + 1)
+        cr.tag_begin(cairo.TAG_LINK, attrs)
+        cr.move_to(x + 2, y + ch - 2)
+        cr.show_text(str(target + 1))
+        cr.tag_end(cairo.TAG_LINK)
+
+
+def draw_notes(cr, rng, width, height):
+    """Draw a double-width page: slide on the left, notes on the right."""
+    draw_vector(cr, rng, width / 2, height)
+    cr.set_source_rgb(0, 0, 0)
+    cr.set_font_size(10)
+    for i in range(30):
+        cr.move_to(width / 2 + 10, 12 + i * 11)
+        cr.show_text(" ".join("note%d" % rng.randrange(1000) for j in range(8)))
+
+
+def make_deck(path, kind, nb_pages, seed=0):
+    """
+    Generate a synthetic PDF deck.
+
+    :param path: path of the PDF file to create
+    :type  path: string
+    :param kind: kind of deck, see :data:`DECK_KINDS`
+    :type  kind: string
+    :param nb_pages: number of pages
+    :type  nb_pages: integer
+    :param seed: seed of the random generator, so that decks are reproducible
+    :type  seed: integer
+    """
+    rng = random.Random(seed)
+    width, height = PAGE_SIZE
+    if kind == "notes":
+        width *= 2
+
+    surface = cairo.PDFSurface(path, width, height)
+    cr = cairo.Context(surface)
+    for number in range(nb_pages):
+        cr.set_source_rgb(1, 1, 1)
+        cr.paint()
+        if kind == "vector":
+            draw_vector(cr, rng, width, height)
+        elif kind == "image":
+            draw_image(cr, rng, width, height)
+        elif kind == "links":
+            draw_links(cr, rng, width, height, number, nb_pages)
+        elif kind == "notes":
+            draw_notes(cr, rng, width, height)
+        else:
+            raise ValueError("Unknown deck kind: %s" % kind)
+        cr.show_page()
+    surface.finish()
+
+
+def measure(func, repeat):
+    """
+    Time a function.
+
+    :param func: function to call, without arguments
+    :type  func: callable
+    :param repeat: number of calls
+    :type  repeat: integer
+    :return: minimum, median and mean durations in milliseconds
+    :rtype: dictionary
+    """
+    durations = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(durations),
+        "median_ms": statistics.median(durations),
+        "mean_ms": statistics.mean(durations),
+        "runs": repeat,
+    }
+
+
+def bench_deck(path, kind, repeat):
+    """
+    Run all the benchmarks on a deck.
+
+    :param path: path to the PDF file
+    :type  path: string
+    :param kind: kind of deck, see :data:`DECK_KINDS`
+    :type  kind: string
+    :param repeat: number of runs of each benchmark
+    :type  repeat: integer
+    :return: results of the benchmarks
+    :rtype: dictionary
+    """
+    uri = "file://" + os.path.abspath(path)
+    results = {"file_size": os.path.getsize(path)}
+
+    # Without background indexing, which would compete with the measurements
+    results["open"] = measure(lambda: document.Document(uri, indexing=False), repeat)
+
+    doc = document.Document(uri, indexing=False)
+    nb_pages = doc.pages_number()
+    results["pages"] = nb_pages
+    pages = range(nb_pages)
+
+    # Fresh pages, each with its own index of named destinations
+    def build_pages(links):
+        for n in pages:
+            with doc.lock:
+                page = document.Page(doc.doc, n, lock=doc.lock)
+            if links:
+                page.get_links()
+
+    results["page"] = measure(lambda: build_pages(False), repeat)
+    results["page_with_links"] = measure(lambda: build_pages(True), repeat)
+
+    types = {"regular": document.PDF_REGULAR}
+    if kind == "notes":
+        types["content"] = document.PDF_CONTENT_PAGE
+        types["notes"] = document.PDF_NOTES_PAGE
+
+    page = doc.page(0)
+    for size_name, (ww, wh) in RENDER_SIZES.items():
+        for type_name, ptype in types.items():
+            surface = cairo.ImageSurface(cairo.FORMAT_RGB24, ww, wh)
+
+            def render():
+                cr = cairo.Context(surface)
+                page.render_cairo(cr, ww, wh, ptype)
+                surface.flush()
+
+            results["render_%s_%s" % (size_name, type_name)] = measure(render, repeat)
+
+    # Link lookups, with normalized coordinates as in the GUI
+    rng = random.Random(0)
+    points = [(rng.random(), rng.random()) for i in range(10000)]
+    all_pages = [doc.page(n) for n in pages]
+    for p in all_pages:
+        p.get_links()
+
+    def lookup():
+        for p in all_pages:
+            for x, y in points:
+                p.get_link_at(x, y)
+
+    timing = measure(lookup, repeat)
+    timing["lookups_per_s"] = len(all_pages) * len(points) / (timing["median_ms"] / 1000)
+    results["get_link_at"] = timing
+
+    return results
+
+
+def usage():
+    """Print the command line usage."""
+    print("Usage: %s [-o output.json] [--pages N] [--repeat N] [--keep DIR] [kind...]"
+          % os.path.basename(sys.argv[0]))
+    print("Kinds of decks: %s" % ", ".join(DECK_KINDS))
+
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "ho:", ["help", "pages=", "repeat=", "keep="])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    output = None
+    nb_pages = 20
+    repeat = 5
+    keep = None
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            usage()
+            sys.exit()
+        elif opt == "-o":
+            output = arg
+        elif opt in ("--pages", "--repeat"):
+            try:
+                value = int(arg)
+            except ValueError:
+                value = 0
+            if value < 1:
+                print("%s must be a positive integer, not \"%s\"" % (opt, arg))
+                usage()
+                sys.exit(2)
+            if opt == "--pages":
+                nb_pages = value
+            else:
+                repeat = value
+        elif opt == "--keep":
+            keep = arg
+
+    kinds = args or DECK_KINDS
+    for kind in kinds:
+        if kind not in DECK_KINDS:
+            print("Unknown deck kind: %s" % kind)
+            usage()
+            sys.exit(2)
+
+    if not hasattr(cairo, "TAG_LINK") and "links" in kinds:
+        print("Cairo is too old to generate links, skipping the \"links\" deck",
+              file=sys.stderr)
+        kinds = [k for k in kinds if k != "links"]
+
+    from gi.repository import Poppler
+
+    directory = keep or tempfile.mkdtemp(prefix="pympress-bench-")
+    os.makedirs(directory, exist_ok=True)
+    results = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "poppler": Poppler.get_version(),
+            "cairo": cairo.cairo_version_string(),
+            "pages": nb_pages,
+            "repeat": repeat,
+        },
+        "decks": {},
+    }
+
+    try:
+        for kind in kinds:
+            path = os.path.join(directory, "%s.pdf" % kind)
+            start = time.perf_counter()
+            make_deck(path, kind, nb_pages)
+            print("Generated %s deck in %.1f s" % (kind, time.perf_counter() - start),
+                  file=sys.stderr)
+            results["decks"][kind] = bench_deck(path, kind, repeat)
+    finally:
+        if keep is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
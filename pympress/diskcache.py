@@ -0,0 +1,250 @@
+#       diskcache.py
+#
+#       Copyright 2014 Julien Enselme <jujens@jujens.eu>
+#
+#       This program is free software; you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation; either version 2 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program; if not, write to the Free Software
+#       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#       MA 02110-1301, USA.
+
+"""
+:mod:`pympress.diskcache` -- Persistent cache of rendered pages
+---------------------------------------------------------------
+
+This module contains the :class:`~pympress.diskcache.DiskCache` class, which
+keeps rendered pages on disk (under the XDG cache directory) between two runs of
+pympress, so that reopening an unchanged document does not need to render its
+pages again.
+
+Entries are raw Cairo ``RGB24`` pixel buffers, stored in one directory per
+document content hash. They are memory-mapped when loaded, so a cached page is
+wrapped in a :class:`cairo.ImageSurface` without being copied. The total size
+of the cache is capped: the least recently used entries are removed first.
+"""
+
+import hashlib
+import mmap
+import os, os.path
+import queue
+import threading
+
+import cairo
+
+
+class DiskCache:
+    """On-disk cache of rendered pages, keyed by document content."""
+
+    #: Root directory of the cache
+    root = None
+    #: Path to the PDF file
+    path = None
+    #: SHA-1 of the PDF file as an hexadecimal string, or ``None`` while it is
+    #: being computed (the cache is disabled meanwhile)
+    doc_hash = None
+    #: Maximum total size of the cache, in bytes
+    max_size = 512 * 1024 * 1024
+    #: Current total size of the cache, in bytes
+    size = 0
+    #: :class:`queue.Queue` of jobs for the writer thread
+    jobs = None
+    #: :class:`threading.Event` set when :attr:`doc_hash` is known
+    hashed = None
+
+    def __init__(self, path, max_size=None):
+        """
+        :param path: path to the PDF file
+        :type  path: string
+        :param max_size: maximum total size of the cache in bytes, or ``None``
+           to use the default
+        :type  max_size: integer
+        """
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        self.root = os.path.join(cache_home, "pympress", "pages")
+        self.path = path
+        if max_size is not None:
+            self.max_size = max_size
+        self.jobs = queue.Queue()
+        self.hashed = threading.Event()
+
+        thread = threading.Thread(target=self.writer, name="disk-cache")
+        thread.daemon = True
+        thread.start()
+
+        self.jobs.put(("scan",))
+        self.rehash()
+
+    def rehash(self):
+        """
+        Compute the hash of the PDF file again (e.g. after it changed). The
+        cache is disabled until the hash is known.
+        """
+        self.doc_hash = None
+        self.hashed.clear()
+        self.jobs.put(("hash",))
+
+    def entry_path(self, doc_hash, key):
+        """
+        Get the path of a cache entry.
+
+        :param doc_hash: hash of the document
+        :type  doc_hash: string
+        :param key: page number, width, height and type of the page
+        :type  key: tuple
+        :return: path of the entry
+        :rtype: string
+        """
+        return os.path.join(self.root, doc_hash, "%d-%dx%d-%d.rgb" % key)
+
+    def has(self, key):
+        """
+        Tell if a rendered page is in the cache.
+
+        :param key: page number, width, height and type of the page
+        :type  key: tuple
+        :return: ``True`` if the page is in the cache
+        :rtype: boolean
+        """
+        doc_hash = self.doc_hash
+        return doc_hash is not None and os.path.exists(self.entry_path(doc_hash, key))
+
+    def load(self, key):
+        """
+        Load a rendered page from the cache.
+
+        :param key: page number, width, height and type of the page
+        :type  key: tuple
+        :return: the rendered page, or ``None`` if it is not in the cache
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        doc_hash = self.doc_hash
+        if doc_hash is None:
+            return None
+
+        width, height = key[1], key[2]
+        stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, width)
+        path = self.entry_path(doc_hash, key)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size != stride * height:
+                    return None
+                # Private writable mapping: pages are only copied if written to
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return cairo.ImageSurface.create_for_data(mapping, cairo.FORMAT_RGB24,
+                                                  width, height, stride)
+
+    def save(self, key, surface):
+        """
+        Queue the writing of a rendered page to the cache.
+
+        :param key: page number, width, height and type of the page
+        :type  key: tuple
+        :param surface: the rendered page, which must not be modified anymore
+        :type  surface: :class:`cairo.ImageSurface`
+        """
+        doc_hash = self.doc_hash
+        if doc_hash is not None:
+            self.jobs.put(("save", doc_hash, key, surface))
+
+    def writer(self):
+        """
+        Writer thread: computes the hash of the document, writes the entries
+        and evicts the old ones, so that the GUI never waits for the disk.
+        """
+        while True:
+            job = self.jobs.get()
+            try:
+                if job[0] == "scan":
+                    self.size = sum(size for path, mtime, size in self._entries())
+                elif job[0] == "hash":
+                    self.doc_hash = self._hash_file()
+                    self.hashed.set()
+                elif job[0] == "save":
+                    self._write(*job[1:])
+            except OSError as e:
+                print(e)
+
+    def _hash_file(self):
+        """
+        Compute the hash of the PDF file.
+
+        :return: SHA-1 of the file content
+        :rtype: string
+        """
+        h = hashlib.sha1()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _write(self, doc_hash, key, surface):
+        """
+        Write an entry, then evict old entries if the cache is too big.
+        """
+        path = self.entry_path(doc_hash, key)
+        if os.path.exists(path):
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = surface.get_data()
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+        self.size += len(data)
+        if self.size > self.max_size:
+            self._evict()
+
+    def _entries(self):
+        """
+        List the entries of the cache.
+
+        :return: path, modification time and size of every entry
+        :rtype: list of tuples
+        """
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_mtime, st.st_size))
+        return entries
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache uses at most 90%
+        of :attr:`max_size`.
+        """
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        self.size = sum(e[2] for e in entries)
+
+        for path, mtime, size in entries:
+            if self.size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+            # Remove the directories of documents without entries left
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
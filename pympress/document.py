@@ -30,24 +30,46 @@ An important point is that this module is *completely* independant from the GUI:
 there should not be any GUI-related code here, except for page rendering (and
 only rendering itself: the preparation of the target surface must be done
 elsewhere).
+
+In particular, it does not import GTK: documents can be opened and rendered
+without any window (e.g. for batch rendering or benchmarks). A
+:class:`~pympress.ui.UI` attaches itself to a document with
+:meth:`~pympress.ui.UI.set_document`, and is then notified of page changes and
+reloads.
 """
 
+import array
+import bisect
+import collections
+import hashlib
+import math
+import re
+import threading
+
+import cairo
+from gi.repository import Gio
+from gi.repository import GLib
 from gi.repository import Poppler
 
 try:
-    from pympress import ui
     from pympress import util
-
-    from pympress.ui import PDF_REGULAR, PDF_NOTES_PAGE
 except ImportError:
-    import ui
     import util
-    from ui import PDF_REGULAR, PDF_NOTES_PAGE
+
+
+#: "Regular" PDF file (without notes)
+PDF_REGULAR = 0
+#: Content page (left side) of a PDF file with notes
+PDF_CONTENT_PAGE = 1
+#: Notes page (right side) of a PDF file with notes
+PDF_NOTES_PAGE = 2
 
 
 class Link:
     """This class encapsulates one hyperlink of the document."""
 
+    __slots__ = ("x1", "y1", "x2", "y2", "dest")
+
     def __init__(self, x1, y1, x2, y2, dest):
         """
         :param x1: first x coordinate of the link rectangle
@@ -88,6 +110,526 @@ class Link:
         return self.dest
 
 
+class LinkIndex:
+    """
+    Spatial index of the links of a page, used for fast hit testing.
+
+    The link rectangles are stored in flat coordinate arrays, and the area they
+    live in is divided in a uniform grid: each cell lists the links overlapping
+    it. Looking up a position then only tests the few links of one cell, and
+    does not allocate anything.
+    """
+
+    __slots__ = ("links", "x1", "y1", "x2", "y2", "nx", "ny", "cw", "ch", "cells")
+
+    #: Maximum number of cells along each axis
+    MAX_CELLS = 32
+
+    def __init__(self, links, width, height):
+        """
+        :param links: the links to index, in order of precedence
+        :type  links: list of :class:`~pympress.document.Link`
+        :param width: width of the area containing the links
+        :type  width: float
+        :param height: height of the area containing the links
+        :type  height: float
+        """
+        self.links = links
+        self.x1 = array.array("d", (l.x1 for l in links))
+        self.y1 = array.array("d", (l.y1 for l in links))
+        self.x2 = array.array("d", (l.x2 for l in links))
+        self.y2 = array.array("d", (l.y2 for l in links))
+
+        n = max(1, min(self.MAX_CELLS, int(math.sqrt(len(links)))))
+        self.nx = self.ny = n
+        self.cw = max(width, 1e-6) / n
+        self.ch = max(height, 1e-6) / n
+
+        cells = [[] for i in range(n * n)]
+        for i in range(len(links)):
+            cx1, cy1 = self._cell(self.x1[i], self.y1[i])
+            cx2, cy2 = self._cell(self.x2[i], self.y2[i])
+            for cy in range(cy1, cy2 + 1):
+                for cx in range(cx1, cx2 + 1):
+                    cells[cy * n + cx].append(i)
+        self.cells = [tuple(c) for c in cells]
+
+    def _cell(self, x, y):
+        """
+        Get the grid cell containing a position (positions outside of the grid
+        are clamped to its border cells).
+
+        :return: column and row of the cell
+        :rtype: (integer, integer)
+        """
+        cx = min(max(int(x / self.cw), 0), self.nx - 1)
+        cy = min(max(int(y / self.ch), 0), self.ny - 1)
+        return cx, cy
+
+    def find(self, x, y):
+        """
+        Get the first link containing the given position.
+
+        :param x: horizontal coordinate
+        :type  x: float
+        :param y: vertical coordinate
+        :type  y: float
+        :return: the link at the given coordinates if one exists, ``None``
+           otherwise
+        :rtype: :class:`pympress.document.Link`
+        """
+        cx, cy = self._cell(x, y)
+        for i in self.cells[cy * self.nx + cx]:
+            if self.x1[i] <= x <= self.x2[i] and self.y1[i] <= y <= self.y2[i]:
+                return self.links[i]
+        return None
+
+
+class BackgroundIndex:
+    """
+    Base class of the indexes of a document that are built by a background
+    thread. Subclasses implement :meth:`build`, reading the document with
+    :meth:`read_pages` so that the lock of the document is only held for one
+    page at a time, and navigation is never blocked for long.
+    """
+
+    #: Name of the background thread
+    thread_name = "index"
+    #: Poppler document (instance of :class:`Poppler.Document`)
+    doc = None
+    #: Lock serializing the accesses to :attr:`doc`
+    lock = None
+    #: Whether the index is not wanted anymore (e.g. after a reload)
+    stopped = False
+    #: :class:`threading.Event` set once the index is built
+    ready = None
+    #: Function called once the index is built. It is called from the
+    #: background thread.
+    on_ready = None
+
+    def __init__(self, doc, lock):
+        """
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param lock: lock to hold while accessing ``doc``
+        :type  lock: :class:`threading.RLock`
+        """
+        self.doc = doc
+        self.lock = lock
+        self.ready = threading.Event()
+
+    def start(self):
+        """Build the index in a background thread."""
+        thread = threading.Thread(target=self.run, name=self.thread_name)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """Stop building the index."""
+        self.stopped = True
+
+    def run(self):
+        """
+        Build the index, then signal it is ready unless it was stopped
+        meanwhile.
+        """
+        self.build()
+        if not self.stopped:
+            self.ready.set()
+            if self.on_ready is not None:
+                self.on_ready()
+
+    def build(self):
+        """Build the index. Must be implemented by subclasses."""
+        raise NotImplementedError
+
+    def read_pages(self, read):
+        """
+        Read something from every page of the document, holding the lock for
+        one page at a time, until the index is stopped.
+
+        :param read: function called with each :class:`Poppler.Page`
+        :type  read: callable
+        :return: page numbers with the values returned by ``read``
+        :rtype: generator of tuples ``(integer, object)``
+        """
+        for number in range(self.doc.get_n_pages()):
+            if self.stopped:
+                return
+            with self.lock:
+                value = read(self.doc.get_page(number))
+            yield number, value
+
+
+class DestIndex(BackgroundIndex):
+    """
+    Document-wide index of the named destinations.
+
+    Resolving a named destination with Poppler is slow, so each name is only
+    resolved once per document and the result is shared by all the pages. The
+    index is filled in the background by :meth:`build`, and names that are not
+    indexed yet are resolved on demand by :meth:`resolve`.
+    """
+
+    thread_name = "dest-index"
+    #: Named destinations, as a dictionary mapping names to page numbers
+    #: (starting from 0), or to ``None`` for unknown destinations
+    dests = {}
+
+    def __init__(self, doc, lock):
+        """
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param lock: lock to hold while accessing ``doc``
+        :type  lock: :class:`threading.RLock`
+        """
+        BackgroundIndex.__init__(self, doc, lock)
+        self.dests = {}
+
+    def build(self):
+        """
+        Collect the named destinations of all the links of the document and
+        resolve them.
+        """
+        if not util.poppler_links_available():
+            return
+
+        def named_dests(page):
+            return [link.action.dest.named_dest for link in page.get_link_mapping()
+                    if type(link.action) is Poppler.ActionGotoDest
+                    and link.action.dest.type == Poppler.DEST_NAMED]
+
+        for number, names in self.read_pages(named_dests):
+            for name in names:
+                self.resolve(name)
+
+    def resolve(self, name):
+        """
+        Get the page targeted by a named destination.
+
+        :param name: name of the destination
+        :type  name: string
+        :return: destination page number (starting from 0), or ``None`` if the
+           destination does not exist
+        :rtype: integer
+        """
+        try:
+            return self.dests[name]
+        except KeyError:
+            pass
+
+        with self.lock:
+            dest = self.doc.find_dest(name)
+        page_num = dest.page_num - 1 if dest is not None else None
+        self.dests[name] = page_num
+        return page_num
+
+
+class TextIndex(BackgroundIndex):
+    """
+    Full-text inverted index of the pages of a document, built incrementally in
+    a background thread. Pages are read directly from Poppler, without creating
+    :class:`~pympress.document.Page` instances, and queries only search the
+    pages indexed so far.
+    """
+
+    #: Regular expression matching the words of a text
+    WORD_RE = re.compile(r"\w+")
+
+    thread_name = "text-index"
+    #: :class:`threading.Lock` protecting the index itself
+    index_lock = None
+    #: Inverted index, as a dictionary mapping lowercase words to the list of
+    #: the numbers of the pages containing them, in increasing order
+    words = {}
+    #: Sorted list of the keys of :attr:`words`, for prefix lookups, or
+    #: ``None`` if it has to be built again
+    vocabulary = None
+    #: Text of the indexed pages, with whitespace collapsed, by page number
+    texts = []
+    #: Number of pages of the document
+    nb_pages = 0
+
+    def __init__(self, doc, lock):
+        """
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param lock: lock to hold while accessing ``doc``
+        :type  lock: :class:`threading.RLock`
+        """
+        BackgroundIndex.__init__(self, doc, lock)
+        self.index_lock = threading.Lock()
+        self.words = {}
+        self.texts = []
+        self.nb_pages = doc.get_n_pages()
+
+    def build(self):
+        """
+        Read the text of all the pages and index their words.
+        """
+        for number, text in self.read_pages(lambda page: page.get_text() or ""):
+            text = " ".join(text.split())
+            with self.index_lock:
+                for word in set(self.WORD_RE.findall(text.lower())):
+                    self.words.setdefault(word, []).append(number)
+                self.texts.append(text)
+                self.vocabulary = None
+
+    def progress(self):
+        """
+        Get the progress of the indexing.
+
+        :return: number of indexed pages and total number of pages
+        :rtype: (integer, integer)
+        """
+        return len(self.texts), self.nb_pages
+
+    def search(self, query, max_results=50):
+        """
+        Find the pages containing all the words of a query. The last word may
+        be incomplete: it matches any word starting with it.
+
+        :param query: the words to look for
+        :type  query: string
+        :param max_results: maximum number of results
+        :type  max_results: integer
+        :return: page numbers in increasing order, each with an excerpt of its
+           text and the ``(start, end)`` offsets of the matches in the excerpt
+        :rtype: list of tuples ``(integer, string, list of tuples)``
+        """
+        terms = self.WORD_RE.findall(query.lower())
+        if not terms:
+            return []
+
+        with self.index_lock:
+            pages = None
+            for term in terms[:-1]:
+                found = set(self.words.get(term, ()))
+                pages = found if pages is None else pages & found
+
+            if self.vocabulary is None:
+                self.vocabulary = sorted(self.words)
+            last = terms[-1]
+            found = set()
+            i = bisect.bisect_left(self.vocabulary, last)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(last):
+                found.update(self.words[self.vocabulary[i]])
+                i += 1
+            pages = found if pages is None else pages & found
+
+            results = sorted(pages)[:max_results]
+            texts = [self.texts[n] for n in results]
+
+        return [(n, ) + self.excerpt(text, terms) for n, text in zip(results, texts)]
+
+    def excerpt(self, text, terms, context=40):
+        """
+        Cut the part of a text around the first match of a query.
+
+        :param text: text of a page
+        :type  text: string
+        :param terms: lowercase words of the query
+        :type  terms: list of strings
+        :param context: number of characters to keep around the first match
+        :type  context: integer
+        :return: the excerpt, and the ``(start, end)`` offsets of all the
+           matches of the words in it
+        :rtype: (string, list of tuples)
+        """
+        pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+        first = pattern.search(text)
+        start = max(0, first.start() - context) if first is not None else 0
+        end = min(len(text), start + 2 * context + (first.end() - first.start() if first else 0))
+
+        excerpt = text[start:end]
+        matches = [m.span() for m in pattern.finditer(excerpt)]
+        if start > 0:
+            excerpt = "\u2026" + excerpt
+            matches = [(a + 1, b + 1) for a, b in matches]
+        if end < len(text):
+            excerpt += "\u2026"
+        return excerpt, matches
+
+
+class Outline(BackgroundIndex):
+    """
+    Outline (table of contents) of a document, read once in a background thread
+    into a flat list of entries in document order. Named destinations are
+    resolved with the :class:`~pympress.document.DestIndex` of the document.
+    """
+
+    thread_name = "outline"
+    #: :class:`~pympress.document.DestIndex` resolving named destinations
+    dests = None
+    #: Entries of the outline, as a list of tuples ``(title, depth, page)``, in
+    #: document order. ``page`` starts from 0, and is ``None`` if the entry does
+    #: not point to a page of the document.
+    entries = []
+    #: Titles of each entry and of its ancestors, joined, by entry
+    paths = []
+    #: Sorted page numbers at which sections start, for :meth:`section`
+    starts = []
+    #: Index in :attr:`entries` of the section starting at each of :attr:`starts`
+    sections = []
+
+    def __init__(self, doc, lock, dests):
+        """
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param lock: lock to hold while accessing ``doc``
+        :type  lock: :class:`threading.RLock`
+        :param dests: index used to resolve named destinations
+        :type  dests: :class:`~pympress.document.DestIndex`
+        """
+        BackgroundIndex.__init__(self, doc, lock)
+        self.dests = dests
+        self.entries = []
+        self.paths = []
+        self.starts = []
+        self.sections = []
+
+    def build(self):
+        """
+        Walk the outline tree, then index the sections by page. The outline is
+        usually small, so the lock is held for the whole walk.
+        """
+        entries = []
+        with self.lock:
+            index = Poppler.IndexIter.new(self.doc)
+            if index is not None:
+                self._walk(index, 0, entries)
+
+        paths, parents = [], []
+        for title, depth, page in entries:
+            parents[depth:] = [title]
+            paths.append(" \u203a ".join(parents))
+
+        # For each page where sections start, the last entry starting there
+        ordered = sorted((page, i) for i, (title, depth, page) in enumerate(entries)
+                         if page is not None)
+        starts, sections = [], []
+        for page, i in ordered:
+            if starts and starts[-1] == page:
+                sections[-1] = i
+            else:
+                starts.append(page)
+                sections.append(i)
+
+        self.entries, self.paths = entries, paths
+        self.starts, self.sections = starts, sections
+
+    def _walk(self, index, depth, entries):
+        """
+        Add the entries of a level of the outline tree, and of their children,
+        to a list. Must be called with :attr:`lock` held.
+
+        :param index: iterator on the first entry of the level
+        :type  index: :class:`Poppler.IndexIter`
+        :param depth: depth of the level, 0 being the top level
+        :type  depth: integer
+        :param entries: list of entries to extend
+        :type  entries: list of tuples
+        """
+        while True:
+            action = index.get_action()
+            if type(action) is Poppler.ActionGotoDest:
+                dest = action.dest
+                if dest.type == Poppler.DEST_NAMED:
+                    page_num = self.dests.resolve(dest.named_dest)
+                else:
+                    page_num = dest.page_num - 1
+                entries.append((action.title, depth, page_num))
+            else:
+                entries.append((getattr(action, "title", None) or "", depth, None))
+
+            child = index.get_child()
+            if child is not None:
+                self._walk(child, depth + 1, entries)
+
+            if not index.next():
+                break
+
+    def section(self, page_nb):
+        """
+        Find the section containing a page, i.e. the last outline entry
+        starting on this page or before it.
+
+        :param page_nb: number of the page
+        :type  page_nb: integer
+        :return: index of the entry in :attr:`entries`, or ``None`` if the
+           page is before the first section
+        :rtype: integer
+        """
+        i = bisect.bisect_right(self.starts, page_nb) - 1
+        return self.sections[i] if i >= 0 else None
+
+
+class PageLabels(BackgroundIndex):
+    """
+    Logical page labels of a document (e.g. the frame numbers of a Beamer
+    presentation, where overlays span several pages), read once in a background
+    thread into two maps, so that converting between labels and page numbers
+    takes constant time. Until they are read, and for pages without a label,
+    the label of a page is its number.
+    """
+
+    thread_name = "page-labels"
+    #: Label of each page, by page number
+    labels = []
+    #: Page numbers by label, only the first page of each label being kept
+    indices = {}
+    #: Whether some labels differ from the page numbers
+    has_labels = False
+
+    def __init__(self, doc, lock):
+        """
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param lock: lock to hold while accessing ``doc``
+        :type  lock: :class:`threading.RLock`
+        """
+        BackgroundIndex.__init__(self, doc, lock)
+        self.labels = []
+        self.indices = {}
+
+    def build(self):
+        """
+        Read the label of every page.
+        """
+        labels, indices = [], {}
+        for number, label in self.read_pages(lambda page: page.get_label()):
+            label = label or str(number + 1)
+            labels.append(label)
+            indices.setdefault(label, number)
+
+        self.labels, self.indices = labels, indices
+        self.has_labels = any(label != str(n + 1) for n, label in enumerate(labels))
+
+    def label(self, number):
+        """
+        Get the label of a page.
+
+        :param number: number of the page
+        :type  number: integer
+        :return: label of the page
+        :rtype: string
+        """
+        if number < len(self.labels):
+            return self.labels[number]
+        return str(number + 1)
+
+    def find(self, label):
+        """
+        Get the first page with a given label.
+
+        :param label: the label to look for
+        :type  label: string
+        :return: number of the page, or ``None`` if no page has this label
+        :rtype: integer
+        """
+        return self.indices.get(label)
+
+
 class Page:
     """
     Class representing a single page.
@@ -102,71 +644,125 @@ class Page:
     #: Number of the current page (starting from 0)
     page_nb = -1
     #: All the links in the page, as a list of :class:`~pympress.document.Link`
-    #: instances
-    links = []
+    #: instances, or ``None`` until they are first needed
+    links = None
+    #: :class:`~pympress.document.LinkIndex` of :attr:`links`
+    link_index = None
+    #: :class:`~pympress.document.DestIndex` used to resolve named destinations
+    dests = None
+    #: Lock to hold while accessing the Poppler document
+    lock = None
     #: Page width as a float
     pw = 0.
     #: Page height as a float
     ph = 0.
 
-    def __init__(self, doc, number):
+    def __init__(self, doc, number, dests=None, lock=None):
         """
         :param doc: the PDF document
         :type  doc: :class:`Poppler.Document`
         :param number: number of the page to fetch in the document
         :type  number: integer
+        :param dests: index used to resolve named destinations (a private one
+           is created if ``None``)
+        :type  dests: :class:`~pympress.document.DestIndex`
+        :param lock: lock to hold while accessing ``doc`` (a private one is
+           created if ``None``)
+        :type  lock: :class:`threading.RLock`
         """
         self.page = doc.get_page(number)
         self.page_nb = number
+        self.lock = lock if lock is not None else threading.RLock()
+        self.dests = dests if dests is not None else DestIndex(doc, self.lock)
 
         # Read page size
         self.pw, self.ph = self.page.get_size()
 
+    def get_links(self):
+        """
+        Get the links of the page. They are read from the PDF file the first
+        time this method is called.
+
+        :return: the links of the page
+        :rtype: list of :class:`~pympress.document.Link`
+        """
+        if self.links is not None:
+            return self.links
+
+        links = []
         if util.poppler_links_available():
-            # Read links on the page
-            link_mapping = self.page.get_link_mapping()
-            self.links = []
+            with self.lock:
+                link_mapping = self.page.get_link_mapping()
 
             for link in link_mapping:
                 if type(link.action) is Poppler.ActionGotoDest:
                     dest = link.action.dest
-                    page_num = dest.page_num
-
                     if dest.type == Poppler.DEST_NAMED:
-                        page_num = doc.find_dest(dest.named_dest).page_num
-
-                    # Page numbering starts at 0
-                    page_num -= 1
+                        page_num = self.dests.resolve(dest.named_dest)
+                        if page_num is None:
+                            continue
+                    else:
+                        # Page numbering starts at 0
+                        page_num = dest.page_num - 1
 
                     my_link = Link(link.area.x1, link.area.y1, link.area.x2,
                                     link.area.y2, page_num)
-                    self.links.append(my_link)
+                    links.append(my_link)
+
+        self.link_index = LinkIndex(links, self.pw, self.ph)
+        self.links = links
+        return links
 
     def number(self):
         """Get the page number"""
         return self.page_nb
 
-    def get_link_at(self, x, y):
+    def get_link_at(self, x, y, type=PDF_REGULAR):
         """
         Get the :class:`~pympress.document.Link` corresponding to the given
         position, or ``None`` if there is no link at this position.
 
-        :param x: horizontal coordinate
+        :param x: horizontal coordinate, relative to the displayed part of the
+           page
         :type  x: float
         :param y: vertical coordinate
         :type  y: float
+        :param type: the type of document that is displayed
+        :type  type: integer
         :return: the link at the given coordinates if one exists, ``None``
            otherwise
         :rtype: :class:`pympress.document.Link`
         """
-        xx = self.pw * x
-        yy = self.ph * (1. - y)
+        if self.links is None:
+            self.get_links()
 
-        for link in self.links:
-            if link.is_over(xx, yy):
-                return link
+        pw, ph = self.get_size(type)
+        dx = pw if type == PDF_NOTES_PAGE else 0
+        return self.link_index.find(dx + pw * x, ph * (1. - y))
 
-        return None
+    def get_hit_map(self, ww, wh, type=PDF_REGULAR):
+        """
+        Get a spatial index of the links of the page in the pixel space of a
+        widget, so that pointer positions can be looked up without any
+        conversion. Only the links of the displayed half are kept for notes
+        documents.
+
+        :param ww: widget width in pixels
+        :type  ww: integer
+        :param wh: widget height in pixels
+        :type  wh: integer
+        :param type: the type of document displayed in the widget
+        :type  type: integer
+        :return: the links of the page, in widget coordinates
+        :rtype: :class:`~pympress.document.LinkIndex`
+        """
+        pw, ph = self.get_size(type)
+        dx = pw if type == PDF_NOTES_PAGE else 0
+        sx, sy = ww / pw, wh / ph
+        links = [Link((l.x1 - dx) * sx, (ph - l.y2) * sy, (l.x2 - dx) * sx,
+                      (ph - l.y1) * sy, l.dest)
+                 for l in self.get_links() if l.x2 > dx and l.x1 < dx + pw]
+        return LinkIndex(links, ww, wh)
 
     def get_size(self, type=PDF_REGULAR):
         """Get the page size.
@@ -216,13 +812,15 @@ class Page:
         cr.scale(scale, scale)
 
         cr.rectangle(0, 0, pw, ph)
-        cr.fill()
+        cr.fill_preserve()
 
         # For "regular" pages, there is no problem: just render them.
         # For "content" or "notes" pages (i.e. left or right half of a page),
-        # the widget already has correct dimensions so we don't need to deal
-        # with that. But for right halfs we must translate the output in order
-        # to only show the right half.
+        # the widget already has correct dimensions, and clipping to the
+        # wanted half lets Poppler and Cairo skip the other one. But for right
+        # halfs we must translate the output in order to only show the right
+        # half.
+        cr.clip()
         if type == PDF_NOTES_PAGE:
             cr.translate(-pw, 0)
 
@@ -238,30 +836,97 @@ class Document:
 
     #: Current PDF document (:class:`Poppler.Document` instance)
     doc = None
+    #: URI of the PDF file
+    uri = None
+    #: Content of the PDF file as a :class:`GLib.Bytes`, when it is loaded
+    #: through a memory mapping (``None`` otherwise)
+    data = None
     #: Number of pages in the document
     nb_pages = -1
     #: Number of the current page
     cur_page = -1
     #: Document with notes or not
     notes = False
-    #: Pages cache (dictionary of :class:`pympress.document.Page`). This makes
+    #: Pages cache (:class:`collections.OrderedDict` of
+    #: :class:`pympress.document.Page`, least recently used first). This makes
     #: navigation in the document faster by avoiding calls to Poppler when loading
     #: a page that has already been loaded.
     pages_cache = {}
-    #: Instance of :class:`pympress.ui.UI` used when opening a document
+    #: Maximum number of pages kept in :attr:`pages_cache`. The current and next
+    #: pages are never evicted, so the cache may temporarily hold more pages.
+    max_cached_pages = 32
+    #: Number of :meth:`page` calls served from :attr:`pages_cache`
+    cache_hits = 0
+    #: Number of :meth:`page` calls that had to fetch the page from Poppler
+    cache_misses = 0
+    #: Number of pages evicted from :attr:`pages_cache`
+    cache_evictions = 0
+    #: :class:`threading.RLock` serializing accesses to the Poppler document,
+    #: which is shared between the GUI and the background indexes (pages are
+    #: prerendered from private Poppler documents, without this lock)
+    lock = None
+    #: :class:`threading.Lock` protecting :attr:`pages_cache` and its
+    #: statistics, only held for the bookkeeping
+    cache_lock = None
+    #: :class:`~pympress.document.DestIndex` shared by all the pages
+    dest_index = None
+    #: :class:`~pympress.document.TextIndex` of the document, for searching
+    text_index = None
+    #: :class:`~pympress.document.Outline` of the document
+    outline = None
+    #: :class:`~pympress.document.PageLabels` of the document
+    page_labels = None
+    #: Fingerprint of each page of the loaded file (see :meth:`fingerprint`),
+    #: or ``None`` until they are computed
+    fingerprints = None
+    #: Fingerprints of the drawings of the pages that were rendered (see
+    #: :meth:`drawing_fingerprint`), by page number, protected by
+    #: :attr:`cache_lock`. They are recorded when the pages are rendered, so
+    #: that reloading never needs to read the previous version of the file.
+    drawings = {}
+    #: :class:`Gio.FileMonitor` watching the PDF file for changes
+    monitor = None
+    #: Delay in milliseconds between the last change of the file and its reload
+    reload_delay = 300
+    #: GLib source id of the pending reload (0 if none)
+    reload_source = 0
+    #: Whether a reload is running in the background
+    reloading = False
+    #: Whether the file changed again while it was being reloaded
+    reload_again = False
+    #: Instance of :class:`pympress.ui.UI` displaying the document, set by
+    #: :meth:`pympress.ui.UI.set_document` (``None`` when used without a GUI)
     ui = None
+    #: Whether the indexes (destinations, text, outline and page labels) are
+    #: built by background threads
+    indexing = True
 
-    def __init__(self, uri, page=0):
+    def __init__(self, uri, page=0, max_cached_pages=None, use_mmap=False, indexing=True):
         """
         :param uri: URI to the PDF file to open (local only, starting with
            :file:`file://`)
         :type  uri: string
         :param page: page number to which the file should be opened
         :type  page: integer
+        :param max_cached_pages: maximum number of pages kept in the pages
+           cache, or ``None`` to use the default
+        :type  max_cached_pages: integer
+        :param use_mmap: ``True`` to map the file in memory and hand the
+           mapping to Poppler, ``False`` to let Poppler read the file. A mapped
+           file must not be truncated while it is open (accessing the mapping
+           would then kill the process), so it cannot be watched.
+        :type  use_mmap: boolean
+        :param indexing: ``False`` to not build the indexes in the background
+           (e.g. to measure the rendering alone): destinations are then only
+           resolved on demand, and the other indexes stay empty
+        :type  indexing: boolean
         """
 
         # Open PDF file
-        self.doc = Poppler.Document.new_from_file(uri, None)
+        self.uri = uri
+        if use_mmap and hasattr(Poppler.Document, "new_from_bytes"):
+            self.data = self.map_file(uri)
+        self.doc = self.new_poppler_document()
 
         # Pages number
         self.nb_pages = self.doc.get_n_pages()
@@ -270,7 +935,15 @@ class Document:
         self.cur_page = page
 
         # Pages cache
-        self.pages_cache = {}
+        self.pages_cache = collections.OrderedDict()
+        if max_cached_pages is not None:
+            self.max_cached_pages = max_cached_pages
+        self.cache_hits = self.cache_misses = self.cache_evictions = 0
+        self.lock = threading.RLock()
+        self.cache_lock = threading.Lock()
+        self.drawings = {}
+        self.indexing = indexing
+        self.create_indexes()
 
         # Guess if the document has notes
         page0 = self.page(page)
@@ -281,10 +954,288 @@ class Document:
             ar = page0.get_aspect_ratio()
             self.notes = (ar >= 2)
 
-        # Create windows
-        self.ui = ui.UI(self)
-        self.ui.on_page_change(False)
-        self.ui.run()
+    def create_indexes(self):
+        """
+        Create the indexes of the current Poppler document, and start building
+        them in the background if :attr:`indexing` is set. The indexes of the
+        previous document, if any, are stopped.
+        """
+        for index in [self.dest_index, self.text_index, self.outline, self.page_labels]:
+            if index is not None:
+                index.stop()
+
+        self.dest_index = DestIndex(self.doc, self.lock)
+        self.text_index = TextIndex(self.doc, self.lock)
+        self.outline = Outline(self.doc, self.lock, self.dest_index)
+        self.page_labels = PageLabels(self.doc, self.lock)
+
+        if self.indexing:
+            self.dest_index.start()
+            self.text_index.start()
+            self.outline.start()
+            self.page_labels.start()
+
+    @staticmethod
+    def map_file(uri):
+        """
+        Map a file in memory, without reading or copying it: its pages are only
+        loaded when Poppler accesses them, and are shared with every other
+        mapping of the file (including the ones of other processes).
+
+        :param uri: URI to the file to map (local only)
+        :type  uri: string
+        :return: the content of the file, which keeps the mapping alive
+        :rtype: :class:`GLib.Bytes`
+        """
+        path = GLib.filename_from_uri(uri)[0]
+        return GLib.MappedFile.new(path, False).get_bytes()
+
+    def new_poppler_document(self):
+        """
+        Open a new :class:`Poppler.Document` for the PDF file.
+
+        When the document is memory-mapped, all the Poppler documents share
+        the same :attr:`data` instead of reading the file again, so opening
+        more of them (e.g. one per rendering thread) is cheap.
+
+        :return: a new Poppler document
+        :rtype: :class:`Poppler.Document`
+        """
+        if self.data is not None:
+            return Poppler.Document.new_from_bytes(self.data, None)
+        else:
+            return Poppler.Document.new_from_file(self.uri, None)
+
+    @staticmethod
+    def fingerprint(doc, number):
+        """
+        Compute a cheap fingerprint of a page, used to detect which pages
+        changed when the file is reloaded. It covers the page size, its text
+        and its links, which do not need to render the page. Changes in
+        pictures and drawings are only caught by :meth:`drawing_fingerprint`.
+
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param number: number of the page
+        :type  number: integer
+        :return: the fingerprint of the page
+        :rtype: bytes
+        """
+        page = doc.get_page(number)
+        pw, ph = page.get_size()
+
+        h = hashlib.sha1()
+        h.update(repr((pw, ph)).encode())
+        h.update((page.get_text() or "").encode("utf-8", "replace"))
+
+        if util.poppler_links_available():
+            for link in page.get_link_mapping():
+                area = link.area
+                h.update(repr((area.x1, area.y1, area.x2, area.y2)).encode())
+                if type(link.action) is Poppler.ActionGotoDest:
+                    dest = link.action.dest
+                    h.update(repr((dest.page_num, dest.named_dest)).encode())
+
+        return h.digest()
+
+    @staticmethod
+    def drawing_fingerprint(doc, number):
+        """
+        Compute the fingerprint of a very low resolution rendering of a page,
+        which catches the changes in pictures and drawings that
+        :meth:`fingerprint` misses. It costs a (tiny) page rendering, so it is
+        only computed for the pages that are rendered, see
+        :meth:`record_drawing`.
+
+        :param doc: the PDF document
+        :type  doc: :class:`Poppler.Document`
+        :param number: number of the page
+        :type  number: integer
+        :return: the fingerprint of the rendering
+        :rtype: bytes
+        """
+        page = doc.get_page(number)
+        pw, ph = page.get_size()
+
+        width = 48
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, max(1, int(width * ph / pw)))
+        cr = cairo.Context(surface)
+        cr.scale(width / pw, width / pw)
+        page.render(cr)
+        surface.flush()
+
+        return hashlib.sha1(surface.get_data()).digest()
+
+    def record_drawing(self, doc, number):
+        """
+        Record the fingerprint of the drawing of a page which was rendered, if
+        it is not known yet. Must be called by the thread using ``doc``.
+
+        :param doc: the Poppler document the page was rendered from
+        :type  doc: :class:`Poppler.Document`
+        :param number: number of the page
+        :type  number: integer
+        """
+        with self.cache_lock:
+            if number in self.drawings:
+                return
+        drawing = self.drawing_fingerprint(doc, number)
+        with self.cache_lock:
+            self.drawings.setdefault(number, drawing)
+
+    def watch(self):
+        """
+        Watch the PDF file and reload it when it changes. Only the pages whose
+        fingerprint changed are dropped from the caches.
+
+        Memory-mapped documents cannot be watched: tools like :program:`pdflatex`
+        rewrite the file in place, and touching the pages of the mapping that
+        are past its new end raises ``SIGBUS``, before any change notification
+        could be handled.
+
+        :raises ValueError: if the document is memory-mapped
+        """
+        if self.data is not None:
+            raise ValueError("Memory-mapped documents cannot be watched")
+
+        gfile = Gio.File.new_for_uri(self.uri)
+        self.monitor = gfile.monitor_file(Gio.FileMonitorFlags.NONE, None)
+        self.monitor.connect("changed", self.on_file_changed)
+
+        thread = threading.Thread(target=self.compute_fingerprints, name="fingerprints")
+        thread.daemon = True
+        thread.start()
+
+    def compute_fingerprints(self):
+        """
+        Compute the fingerprints of the loaded file. The lock is only held for
+        one page at a time.
+        """
+        doc = self.doc
+        fingerprints = []
+        for number in range(doc.get_n_pages()):
+            with self.lock:
+                if self.doc is not doc:
+                    return
+                fingerprints.append(self.fingerprint(doc, number))
+
+        with self.lock:
+            if self.doc is doc:
+                self.fingerprints = fingerprints
+
+    def on_file_changed(self, monitor, gfile, other_file, event_type):
+        """
+        Manage changes of the PDF file: reload it once it has not changed for
+        :attr:`reload_delay` milliseconds.
+        """
+        if event_type not in [Gio.FileMonitorEvent.CHANGED,
+                              Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                              Gio.FileMonitorEvent.CREATED]:
+            return
+
+        if self.reload_source:
+            GLib.source_remove(self.reload_source)
+        self.reload_source = GLib.timeout_add(self.reload_delay, self.start_reload)
+
+    def start_reload(self):
+        """
+        Reload the PDF file in a background thread.
+
+        :return: ``False`` (to run only once as a GLib callback)
+        :rtype: boolean
+        """
+        self.reload_source = 0
+        if self.reloading:
+            self.reload_again = True
+            return False
+
+        self.reloading = True
+        thread = threading.Thread(target=self.reload, name="reload")
+        thread.daemon = True
+        thread.start()
+        return False
+
+    def reload(self):
+        """
+        Open the PDF file again and fingerprint its pages. The new document is
+        then swapped in by :meth:`finish_reload` in the GTK main loop.
+
+        Only the pages that were rendered and whose text and links did not
+        change are rendered again, to compare their drawings with
+        :attr:`drawings`: the other pages are rendered from the new file
+        anyway when they are displayed. The previous version of the file is
+        never read, since it may have been overwritten in place.
+        """
+        redrawn = set()
+        try:
+            doc = Poppler.Document.new_from_file(self.uri, None)
+            fingerprints = [self.fingerprint(doc, n) for n in range(doc.get_n_pages())]
+
+            with self.cache_lock:
+                old, drawings = self.fingerprints or [], dict(self.drawings)
+            for number, before in drawings.items():
+                if number < min(len(old), len(fingerprints)) and old[number] == fingerprints[number]:
+                    if before != self.drawing_fingerprint(doc, number):
+                        redrawn.add(number)
+        except (GLib.Error, OSError, ValueError) as e:
+            # Most likely, the file is still being written
+            print("Could not reload %s: %s" % (self.uri, e))
+            doc = fingerprints = None
+
+        GLib.idle_add(self.finish_reload, doc, fingerprints, redrawn)
+
+    def finish_reload(self, doc, fingerprints, redrawn):
+        """
+        Swap a reloaded document in, keeping the cached pages that did not
+        change, and notify the GUI of the pages that did.
+
+        :param doc: the reloaded document, or ``None`` if reloading failed
+        :type  doc: :class:`Poppler.Document`
+        :param fingerprints: fingerprints of the pages of ``doc``
+        :type  fingerprints: list of bytes
+        :param redrawn: numbers of the pages whose drawings changed although
+           their fingerprints did not
+        :type  redrawn: set of integers
+        :return: ``False`` (to run only once as a GLib callback)
+        :rtype: boolean
+        """
+        self.reloading = False
+
+        if doc is not None:
+            with self.lock:
+                old = self.fingerprints or []
+                nb_pages = doc.get_n_pages()
+                changed = {n for n in range(max(nb_pages, self.nb_pages))
+                           if n >= nb_pages or n >= len(old) or old[n] != fingerprints[n]}
+                changed |= redrawn
+
+                self.doc = doc
+                self.nb_pages = nb_pages
+                self.fingerprints = fingerprints
+                self.cur_page = max(0, min(self.cur_page, nb_pages - 1))
+
+                # Destinations may have moved if pages were added or removed
+                self.create_indexes()
+
+                with self.cache_lock:
+                    self.drawings = {n: d for n, d in self.drawings.items() if n not in changed}
+                    for number in list(self.pages_cache):
+                        if number in changed:
+                            del self.pages_cache[number]
+                        else:
+                            page = self.pages_cache[number]
+                            page.page = doc.get_page(number)
+                            page.dests = self.dest_index
+                            page.links = page.link_index = None
+
+            if self.ui is not None:
+                self.ui.on_document_reload(changed)
+
+        if self.reload_again:
+            self.reload_again = False
+            self.start_reload()
+
+        return False
 
     def has_notes(self):
         """Get the document mode.
@@ -305,9 +1256,62 @@ class Document:
         if number >= self.nb_pages or number < 0:
             return None
 
-        if not number in self.pages_cache:
-            self.pages_cache[number] = Page(self.doc, number)
-        return self.pages_cache[number]
+        with self.cache_lock:
+            page = self.pages_cache.get(number)
+            if page is not None:
+                self.pages_cache.move_to_end(number)
+                self.cache_hits += 1
+                return page
+            self.cache_misses += 1
+
+        with self.lock:
+            page = Page(self.doc, number, self.dest_index, self.lock)
+
+        with self.cache_lock:
+            # Another thread may have fetched the page meanwhile
+            page = self.pages_cache.setdefault(number, page)
+            self.pages_cache.move_to_end(number)
+            self._evict_pages()
+            return page
+
+    def evict_pages(self):
+        """
+        Drop the least recently used pages from the pages cache until it fits
+        in :attr:`max_cached_pages`. The current and next pages are pinned.
+        """
+        with self.cache_lock:
+            self._evict_pages()
+
+    def _evict_pages(self):
+        """
+        Same as :meth:`evict_pages`, but must be called with :attr:`cache_lock`
+        held.
+        """
+        pinned = (self.cur_page, self.cur_page + 1)
+        excess = len(self.pages_cache) - self.max_cached_pages
+        for number in list(self.pages_cache):
+            if excess <= 0:
+                break
+            if number in pinned:
+                continue
+            del self.pages_cache[number]
+            self.cache_evictions += 1
+            excess -= 1
+
+    def cache_stats(self):
+        """Get the usage statistics of the pages cache.
+
+        :return: number of cached pages, hits, misses and evictions
+        :rtype: dictionary
+        """
+        with self.cache_lock:
+            return {
+                "size": len(self.pages_cache),
+                "max_size": self.max_cached_pages,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "evictions": self.cache_evictions,
+            }
 
     def current_page(self):
         """Get the current page.
@@ -346,7 +1350,8 @@ class Document:
 
         if number != self.cur_page:
             self.cur_page = number
-            self.ui.on_page_change()
+            if self.ui is not None:
+                self.ui.on_page_change()
 
     def goto_next(self):
         """Switch to the next page."""
@@ -20,25 +20,78 @@
 #       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 #       MA 02110-1301, USA.
 
+import getopt
 import os.path
 import sys
-
-from gi.repository import Gtk
-
-from gi.repository import Gdk
+import threading
 
 try:
-    from pympress import document
+    from pympress import util
 except ImportError:
-    import document
+    import util
+
+
+def usage():
+    """Print the command line usage."""
+    print("Usage: %s [--profile-startup] [--mmap] [--disk-cache]\n"
+          "       [--render-processes=N] [--warmup] [file.pdf]" % os.path.basename(sys.argv[0]))
+
 
 def main():
+    timer = util.PhaseTimer()
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h", ["help", "profile-startup", "mmap", "disk-cache",
+                                                       "render-processes=", "warmup"])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    profile = False
+    use_mmap = False
+    use_disk_cache = False
+    render_processes = 0
+    warmup = False
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            usage()
+            sys.exit()
+        elif opt == "--profile-startup":
+            profile = True
+        elif opt == "--mmap":
+            use_mmap = True
+        elif opt == "--disk-cache":
+            use_disk_cache = True
+        elif opt == "--render-processes":
+            try:
+                render_processes = int(arg)
+            except ValueError:
+                render_processes = -1
+            if render_processes < 0:
+                print("--render-processes must be a non-negative integer, not \"%s\"" % arg)
+                usage()
+                sys.exit(2)
+        elif opt == "--warmup":
+            warmup = True
+
+    if warmup and not (use_disk_cache and render_processes > 0):
+        print("--warmup needs both --disk-cache and --render-processes")
+        usage()
+        sys.exit(2)
+
+    # GTK is only imported once the command line has been parsed
+    from gi.repository import Gtk
+    from gi.repository import Gdk
+    from gi.repository import GLib
+
     Gdk.threads_init()
+    timer.mark("import GTK")
 
     # PDF file to open
     name = None
-    if len(sys.argv) > 1:
-        name = os.path.abspath(sys.argv[1])
+    if args:
+        name = os.path.abspath(args[0])
 
         # Check if the path is valid
         if not os.path.exists(name):
@@ -90,8 +143,75 @@ def main():
         dialog.run()
         sys.exit(1)
 
-    # Really open the PDF file
-    document.Document("file://" + name)
+    timer.mark("choose file")
+
+    # Show the windows right away, with a placeholder
+    try:
+        from pympress import ui
+    except ImportError:
+        import ui
+    gui = ui.UI()
+    timer.mark("create windows")
+
+    def on_loaded(doc):
+        timer.mark("open document")
+        disk_cache = None
+        if use_disk_cache:
+            try:
+                from pympress import diskcache
+            except ImportError:
+                import diskcache
+            disk_cache = diskcache.DiskCache(name)
+
+        render_pool = None
+        if render_processes > 0:
+            try:
+                from pympress import renderpool
+            except ImportError:
+                import renderpool
+            render_pool = renderpool.RenderPool(doc.uri, render_processes, use_mmap)
+
+        gui.set_document(doc, disk_cache, render_pool)
+        if warmup:
+            gui.cache.warmup()
+        if use_mmap:
+            # A mapped file that is rewritten in place crashes the process
+            print("The file is memory-mapped (--mmap): it will not be reloaded when it changes",
+                  file=sys.stderr)
+        else:
+            doc.watch()
+        timer.mark("first page")
+        if profile:
+            timer.report()
+        return False
+
+    def load():
+        # Really open the PDF file, without blocking the GTK main loop
+        try:
+            from pympress import document
+        except ImportError:
+            import document
+        try:
+            doc = document.Document("file://" + name, use_mmap=use_mmap)
+        except (GLib.Error, OSError, ValueError) as e:
+            GLib.idle_add(on_error, """Could not open the file "%s":\n\n%s""" % (name, e))
+        else:
+            GLib.idle_add(on_loaded, doc)
+
+    def on_error(msg):
+        # Loading failed: tell it instead of waiting for the document forever
+        dialog = Gtk.MessageDialog(None, 0, Gtk.MessageType.ERROR, Gtk.ButtonsType.OK, msg)
+        dialog.set_position(Gtk.WindowPosition.CENTER)
+        dialog.run()
+        dialog.destroy()
+        Gtk.main_quit()
+        return False
+
+    thread = threading.Thread(target=load, name="load")
+    thread.daemon = True
+    thread.start()
+
+    gui.run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,348 @@
+#       overview.py
+#
+#       Copyright 2014 Julien Enselme <jujens@jujens.eu>
+#
+#       This program is free software; you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation; either version 2 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program; if not, write to the Free Software
+#       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#       MA 02110-1301, USA.
+
+"""
+:mod:`pympress.overview` -- Grid of all the pages
+-------------------------------------------------
+
+This module contains the :class:`~pympress.overview.Overview` class, a
+scrollable grid showing a thumbnail of every page of the document, used in the
+Presenter window to jump to any page.
+
+The grid is virtual: a :class:`Gtk.DrawingArea` the size of the visible area
+draws the cells of the rows that are scrolled into view, next to a scrollbar
+whose adjustment spans all the rows. Thumbnails come from a
+:class:`~pympress.pixbufcache.ThumbnailCache` and are only requested for the
+rows around the visible part of the grid, so opening the overview costs the
+same for any number of pages.
+"""
+
+from gi.repository import Gtk
+from gi.repository import Gdk
+from gi.repository import GLib
+
+try:
+    from pympress import pixbufcache
+except ImportError:
+    import pixbufcache
+
+
+class Overview:
+    """Scrollable grid of page thumbnails."""
+
+    #: Maximum width of the thumbnails, in pixels
+    thumb_width = 192
+    #: Maximum height of the thumbnails, in pixels
+    thumb_height = 144
+    #: Space around the thumbnails, in pixels
+    padding = 12
+    #: Height of the page numbers below the thumbnails, in pixels
+    label_height = 18
+    #: Number of rows outside of the visible area whose thumbnails are
+    #: rendered in advance
+    margin_rows = 2
+
+    #: Current :class:`~pympress.document.Document` instance
+    doc = None
+    #: :class:`~pympress.pixbufcache.ThumbnailCache` of the grid
+    thumbnails = None
+    #: Function called with a page number when a page is chosen
+    on_select = None
+    #: :class:`Gtk.Box` holding the grid and its scrollbar, to add to a window
+    widget = None
+    #: :class:`Gtk.DrawingArea` showing the visible part of the grid
+    da = None
+    #: :class:`Gtk.Adjustment` of the vertical position in the grid, in pixels
+    adjustment = None
+    #: Number of columns of the grid
+    cols = 1
+    #: Whether to scroll to the current page once the grid is laid out
+    scroll_pending = False
+
+    def __init__(self, doc, on_select, wtype):
+        """
+        :param doc: the current document
+        :type  doc: :class:`pympress.document.Document`
+        :param on_select: function called with a page number when a page is
+           chosen
+        :type  on_select: callable
+        :param wtype: type of document to show in the thumbnails
+        :type  wtype: integer
+        """
+        self.doc = doc
+        self.on_select = on_select
+        self.thumbnails = pixbufcache.ThumbnailCache(doc, self.thumb_width, self.thumb_height, wtype)
+        self.thumbnails.on_ready = lambda page_nb: GLib.idle_add(self.on_thumbnail, page_nb)
+
+        self.adjustment = Gtk.Adjustment(0, 0, 0, 0, 0, 0)
+        self.adjustment.connect("value-changed", self.on_scroll)
+
+        self.da = Gtk.DrawingArea()
+        self.da.add_events(Gdk.EventMask.BUTTON_PRESS_MASK | Gdk.EventMask.SCROLL_MASK)
+        self.da.connect("draw", self.on_draw)
+        self.da.connect("button-press-event", self.on_click)
+        self.da.connect("scroll-event", self.on_wheel)
+        self.da.connect("size-allocate", self.on_resize)
+        self.da.connect("notify::scale-factor", self.on_scale_change)
+
+        self.widget = Gtk.HBox()
+        self.widget.pack_start(self.da, True, True, 0)
+        self.widget.pack_start(Gtk.VScrollbar(adjustment=self.adjustment), False, False, 0)
+        self.widget.set_no_show_all(True)
+
+    def cell_size(self):
+        """
+        Get the size of a cell of the grid.
+
+        :return: width and height of a cell, in pixels
+        :rtype: (integer, integer)
+        """
+        return (self.thumb_width + 2 * self.padding,
+                self.thumb_height + self.label_height + 2 * self.padding)
+
+    def show(self, height):
+        """
+        Show the grid, scrolled to the current page once it is laid out.
+
+        :param height: height of the grid, in pixels
+        :type  height: integer
+        """
+        self.scroll_pending = True
+        self.widget.set_size_request(-1, height)
+        self.widget.show_all()
+        self.thumbnails.set_size(self.thumb_width * self.da.get_scale_factor(),
+                                 self.thumb_height * self.da.get_scale_factor())
+
+    def hide(self):
+        """Hide the grid, and stop rendering thumbnails."""
+        self.widget.hide()
+        self.thumbnails.request([])
+
+    def set_type(self, wtype):
+        """
+        Change the type of document shown in the thumbnails.
+
+        :param wtype: type of document to show
+        :type  wtype: integer
+        """
+        self.thumbnails.set_type(wtype)
+        if self.widget.get_visible():
+            self.request_visible()
+            self.da.queue_draw()
+
+    def visible_pages(self, margin=0):
+        """
+        Get the pages in the visible part of the grid.
+
+        :param margin: number of extra rows to include above and below
+        :type  margin: integer
+        :return: numbers of the pages in these rows
+        :rtype: range
+        """
+        cw, ch = self.cell_size()
+        top = self.adjustment.get_value()
+        first = max(0, int(top // ch) - margin)
+        last = int((top + self.adjustment.get_page_size()) // ch) + margin
+        return range(first * self.cols, min(self.doc.pages_number(), (last + 1) * self.cols))
+
+    def request_visible(self):
+        """
+        Request the thumbnails of the visible rows first, then those of the
+        rows around them.
+        """
+        visible = self.visible_pages()
+        around = [p for p in self.visible_pages(self.margin_rows) if p not in visible]
+        self.thumbnails.request(list(visible) + around)
+
+    def on_resize(self, widget, allocation):
+        """
+        Lay out the grid for the new size of the drawing area.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :param allocation: the new allocation of the widget
+        :type  allocation: :class:`Gdk.Rectangle`
+        """
+        self.layout(allocation)
+
+    def layout(self, allocation=None):
+        """
+        Lay out the grid for the size of the drawing area and the number of
+        pages of the document (e.g. after it was reloaded).
+
+        :param allocation: the allocation of the drawing area, or ``None`` to
+           use its current one
+        :type  allocation: :class:`Gdk.Rectangle`
+        """
+        if allocation is None:
+            allocation = self.da.get_allocation()
+
+        cw, ch = self.cell_size()
+        self.cols = max(1, allocation.width // cw)
+        rows = (self.doc.pages_number() + self.cols - 1) // self.cols
+
+        value = self.adjustment.get_value()
+        if self.scroll_pending:
+            self.scroll_pending = False
+            row = self.doc.current_page().number() // self.cols
+            value = row * ch - (allocation.height - ch) / 2
+        value = max(0, min(value, rows * ch - allocation.height))
+
+        self.adjustment.configure(value, 0, rows * ch, ch / 4, allocation.height, allocation.height)
+        self.request_visible()
+
+    def on_scale_change(self, widget, pspec):
+        """
+        Render the thumbnails again at the new scale factor of the grid.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :param pspec: the ``scale-factor`` property
+        :type  pspec: :class:`GObject.ParamSpec`
+        """
+        scale = widget.get_scale_factor()
+        self.thumbnails.set_size(self.thumb_width * scale, self.thumb_height * scale)
+        if self.widget.get_visible():
+            self.request_visible()
+            self.da.queue_draw()
+
+    def on_scroll(self, adjustment):
+        """
+        Redraw the grid and request the thumbnails of the rows that scrolled
+        into view.
+
+        :param adjustment: the vertical adjustment of the grid
+        :type  adjustment: :class:`Gtk.Adjustment`
+        """
+        if self.widget.get_visible():
+            self.request_visible()
+            self.da.queue_draw()
+
+    def on_wheel(self, widget, event):
+        """
+        Scroll the grid with the mouse wheel.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :param event: the scroll event
+        :type  event: :class:`Gdk.EventScroll`
+        :return: ``True``, so that the event does not change the current page
+        :rtype: boolean
+        """
+        cw, ch = self.cell_size()
+        if event.direction == Gdk.ScrollDirection.UP:
+            delta = -ch / 2
+        elif event.direction == Gdk.ScrollDirection.DOWN:
+            delta = ch / 2
+        else:
+            return True
+
+        adj = self.adjustment
+        adj.set_value(max(0, min(adj.get_value() + delta, adj.get_upper() - adj.get_page_size())))
+        return True
+
+    def on_thumbnail(self, page_nb):
+        """
+        Redraw the cell of a page whose thumbnail was just rendered.
+
+        :param page_nb: number of the page
+        :type  page_nb: integer
+        :return: ``False``, so that this idle callback is only called once
+        :rtype: boolean
+        """
+        cw, ch = self.cell_size()
+        col, row = page_nb % self.cols, page_nb // self.cols
+        top = int(self.adjustment.get_value())
+        self.da.queue_draw_area(col * cw, row * ch - top, cw, ch)
+        return False
+
+    def on_draw(self, widget, cr):
+        """
+        Draw the cells of the grid that intersect the exposed area.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :param cr: the Cairo context to draw on
+        :type  cr: :class:`cairo.Context`
+        """
+        cw, ch = self.cell_size()
+        top = int(self.adjustment.get_value())
+        x1, y1, x2, y2 = cr.clip_extents()
+        first = max(0, int((y1 + top) // ch) * self.cols)
+        last = min(self.doc.pages_number(), (int((y2 + top) // ch) + 1) * self.cols)
+        current = self.doc.current_page().number()
+        scale = widget.get_scale_factor()
+
+        cr.set_source_rgb(0.2, 0.2, 0.2)
+        cr.paint()
+        cr.set_font_size(12)
+        cr.translate(0, -top)
+
+        for page_nb in range(first, last):
+            x = (page_nb % self.cols) * cw + self.padding
+            y = (page_nb // self.cols) * ch + self.padding
+
+            thumbnail = self.thumbnails.get(page_nb)
+            if thumbnail is not None:
+                # Thumbnails are rendered in device pixels
+                tw, th = thumbnail.get_width() / scale, thumbnail.get_height() / scale
+                tx = x + (self.thumb_width - tw) // 2
+                ty = y + (self.thumb_height - th) // 2
+                cr.save()
+                cr.translate(tx, ty)
+                cr.scale(1. / scale, 1. / scale)
+                cr.set_source_surface(thumbnail, 0, 0)
+                cr.paint()
+                cr.restore()
+            else:
+                tx, ty, tw, th = x, y, self.thumb_width, self.thumb_height
+                cr.set_source_rgb(0.35, 0.35, 0.35)
+                cr.rectangle(tx, ty, tw, th)
+                cr.fill()
+
+            if page_nb == current:
+                cr.set_source_rgb(1, 0.6, 0)
+                cr.set_line_width(3)
+                cr.rectangle(tx - 2, ty - 2, tw + 4, th + 4)
+                cr.stroke()
+
+            label = str(page_nb + 1)
+            extents = cr.text_extents(label)
+            cr.set_source_rgb(1, 1, 1)
+            cr.move_to(x + (self.thumb_width - extents[4]) / 2,
+                       y + self.thumb_height + self.label_height - 4)
+            cr.show_text(label)
+
+    def on_click(self, widget, event):
+        """
+        Choose the page that was clicked.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :param event: the button press event
+        :type  event: :class:`Gdk.EventButton`
+        """
+        if event.type != Gdk.EventType.BUTTON_PRESS or event.button != 1:
+            return
+
+        cw, ch = self.cell_size()
+        col = int(event.x // cw)
+        page_nb = int((event.y + self.adjustment.get_value()) // ch) * self.cols + col
+        if col < self.cols and page_nb < self.doc.pages_number():
+            self.on_select(page_nb)
@@ -0,0 +1,1027 @@
+#       pixbufcache.py
+#
+#       Copyright 2009, 2010 Thomas Jost <thomas.jost@gmail.com>
+#       Copyright 2014 Julien Enselme <jujens@jujens.eu>
+#
+#       This program is free software; you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation; either version 2 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program; if not, write to the Free Software
+#       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#       MA 02110-1301, USA.
+
+"""
+:mod:`pympress.pixbufcache` -- Pages prerendering and caching
+-------------------------------------------------------------
+
+This modules contains stuff needed for caching pages and prerendering them. This
+is done by the :class:`~pympress.pixbufcache.PixbufCache` class.
+
+Pages are rendered to off-screen Cairo image surfaces, so that displaying a page
+that is already in the cache is only a matter of painting a surface on the
+screen. Prerendering happens in a background thread: access to the Poppler
+document is serialized by the lock of the :class:`~pympress.document.Document`.
+When a :class:`~pympress.diskcache.DiskCache` is given, pages missing from the
+cache are looked up on disk before being rendered, and new renderings are saved
+there. When a :class:`~pympress.renderpool.RenderPool` is given, Poppler runs in
+its worker processes, and all the pages of the prerendering window are rendered
+in parallel.
+
+Each page is only rendered by Poppler once per document type, at the size of
+the largest widget displaying this type. Smaller widgets get a downscaled copy
+of this "master" surface, so that e.g. the current slide of the Presenter
+window reuses the rendering of the Content window.
+
+Pages that are not in the cache when they have to be displayed are rendered
+progressively: :meth:`~pympress.pixbufcache.PixbufCache.draft` quickly gives a
+low quality version of the page, while the full rendering is requested from the
+background thread with :meth:`~pympress.pixbufcache.PixbufCache.request`.
+
+When two consecutive pages are rendered at the same size, the region where
+they differ is recorded (see :func:`~pympress.pixbufcache.diff_rect`), so that
+going from one to the other, e.g. between the overlays of a Beamer frame, only
+repaints this region.
+"""
+
+import collections
+import threading
+
+import cairo
+
+# NumPy is optional, and only used to compare rendered pages faster
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from pympress import document
+except ImportError:
+    import document
+
+
+def diff_rect(a, b):
+    """
+    Find the region where two rendered pages differ.
+
+    With NumPy, this is the bounding box of the differing pixels. Without it,
+    whole rows are compared, and the region spans the width of the pages.
+
+    :param a: first rendered page
+    :type  a: :class:`cairo.ImageSurface`
+    :param b: second rendered page, of the same size and format as ``a``
+    :type  b: :class:`cairo.ImageSurface`
+    :return: the region as a tuple ``(x, y, width, height)`` in pixels, empty
+       if the pages are identical
+    :rtype: tuple
+    """
+    width, height, stride = a.get_width(), a.get_height(), a.get_stride()
+    data_a, data_b = a.get_data(), b.get_data()
+
+    if numpy is not None:
+        pixels_a = numpy.frombuffer(data_a, numpy.uint32).reshape(height, stride // 4)[:, :width]
+        pixels_b = numpy.frombuffer(data_b, numpy.uint32).reshape(height, stride // 4)[:, :width]
+        diff = pixels_a != pixels_b
+        rows = numpy.flatnonzero(diff.any(axis=1))
+        if not len(rows):
+            return (0, 0, 0, 0)
+        cols = numpy.flatnonzero(diff[rows[0]:rows[-1] + 1].any(axis=0))
+        return (int(cols[0]), int(rows[0]), int(cols[-1] - cols[0] + 1), int(rows[-1] - rows[0] + 1))
+
+    # Scan the rows from the top and from the bottom, stopping at the first
+    # difference. Rows are compared as slices of pixels, without copying them.
+    pixels_a = memoryview(data_a).cast("B").cast("I")
+    pixels_b = memoryview(data_b).cast("B").cast("I")
+    row = stride // 4
+    differs = lambda y: pixels_a[y * row:y * row + width] != pixels_b[y * row:y * row + width]
+    first = next((y for y in range(height) if differs(y)), None)
+    if first is None:
+        return (0, 0, 0, 0)
+    last = next(y for y in range(height - 1, first - 1, -1) if differs(y))
+    return (0, first, width, last - first + 1)
+
+
+class PixbufCache:
+    """Pages caching and prerendering made (almost) easy."""
+
+    #: Size of the different managed widgets in device pixels, as a dictionary
+    #: of tuples
+    surface_size = {}
+    #: Type of document handled by each widget, as a dictionary of integers
+    #: (see :const:`~pympress.document.PDF_REGULAR` and friends)
+    surface_type = {}
+    #: Cache of rendered pages, as a dictionary mapping tuples
+    #: ``(page number, width, height, type)`` to :class:`cairo.ImageSurface`
+    #: instances. Widgets with the same size and type share their entries.
+    surface_cache = {}
+    #: :class:`threading.Condition` protecting the caches and the job list
+    lock = None
+    #: Page numbers waiting to be prerendered, most urgent first
+    jobs = []
+    #: Current :class:`~pympress.document.Document` instance
+    doc = None
+    #: :class:`~pympress.diskcache.DiskCache` instance, or ``None``
+    disk_cache = None
+    #: :class:`~pympress.renderpool.RenderPool` instance, or ``None``
+    pool = None
+    #: Renderings running in :attr:`pool`, as a dictionary mapping keys to
+    #: :class:`~pympress.renderpool.RenderJob` instances
+    pending = {}
+    #: Range of page numbers that are kept in the cache, as a tuple
+    #: ``(first, last)`` (both included)
+    window = (0, -1)
+    #: Number of :meth:`lookup` calls served from the cache
+    hits = 0
+    #: Number of :meth:`lookup` calls that did not find the page
+    misses = 0
+    #: Counter increased by :meth:`invalidate`, so that pages rendered before
+    #: an invalidation are not stored in the cache
+    generation = 0
+    #: Keys of the pages requested with :meth:`request` and not rendered yet
+    wanted = set()
+    #: Function called with the key of every requested page once it is in the
+    #: cache. It is called from the rendering thread.
+    on_ready = None
+    #: Private :class:`Poppler.Document` used to render drafts in the GUI
+    #: thread, without waiting for any other thread
+    draft_doc = None
+    #: Private :class:`Poppler.Document` of the rendering thread, so that the
+    #: GUI never waits for a page being prerendered to access :attr:`doc`
+    render_doc = None
+    #: Resolution of drafts rendered by Poppler, relative to the widget size
+    draft_scale = 0.25
+    #: Regions where consecutive pages differ, as a dictionary mapping the key
+    #: of a page (see :attr:`surface_cache`) to a rectangle ``(x, y, width,
+    #: height)`` in pixels, relative to the next page at the same size and type
+    damage = {}
+
+    def __init__(self, doc, disk_cache=None, pool=None):
+        """
+        :param doc: the current document
+        :type  doc: :class:`pympress.document.Document`
+        :param disk_cache: persistent cache to use, if any
+        :type  disk_cache: :class:`~pympress.diskcache.DiskCache`
+        :param pool: worker processes to render pages with, if any
+        :type  pool: :class:`~pympress.renderpool.RenderPool`
+        """
+        self.doc = doc
+        self.disk_cache = disk_cache
+        self.pool = pool
+        self.pending = {}
+        self.surface_size = {}
+        self.surface_type = {}
+        self.surface_cache = {}
+        self.lock = threading.Condition()
+        self.jobs = []
+        self.window = (0, -1)
+        self.generation = 0
+        self.hits = self.misses = 0
+        self.wanted = set()
+        self.damage = {}
+
+        thread = threading.Thread(target=self.renderer, name="prerender")
+        thread.daemon = True
+        thread.start()
+
+    def add_widget(self, widget_name, wtype):
+        """
+        Add a widget to the list of widgets that have to be managed (for caching
+        and prerendering).
+
+        :param widget_name: name of the new widget
+        :type  widget_name: string
+        :param wtype: type of document handled by the widget
+        :type  wtype: integer
+        """
+        with self.lock:
+            self.surface_size[widget_name] = (-1, -1)
+            self.surface_type[widget_name] = wtype
+
+    def set_size(self, widget_name, width, height):
+        """
+        Set the size of a widget. If it changed, the entries that were only
+        used by this widget are invalidated and the pages of the current window
+        are prerendered again at the new size.
+
+        Sizes are in device pixels, so that a change of scale factor of a widget
+        is handled like a resize of this widget only.
+
+        :param widget_name: name of the widget that is resized
+        :type  widget_name: string
+        :param width: new width of the widget, in device pixels
+        :type  width: integer
+        :param height: new height of the widget, in device pixels
+        :type  height: integer
+        """
+        with self.lock:
+            if self.surface_size[widget_name] != (width, height):
+                self.surface_size[widget_name] = (width, height)
+                self._spec_changed()
+
+    def get_widget_type(self, widget_name):
+        """
+        Get the document type of a widget.
+
+        :param widget_name: name of the widget
+        :type  widget_name: string
+        :return: type of document handled by the widget
+        :rtype: integer
+        """
+        return self.surface_type[widget_name]
+
+    def set_widget_type(self, widget_name, wtype):
+        """
+        Set the document type of a widget. If it changed, the entries that were
+        only used by this widget are invalidated.
+
+        :param widget_name: name of the widget
+        :type  widget_name: string
+        :param wtype: type of document handled by the widget
+        :type  wtype: integer
+        """
+        with self.lock:
+            if self.surface_type[widget_name] != wtype:
+                self.surface_type[widget_name] = wtype
+                self._spec_changed()
+
+    def prerender(self, page_min, page_max, priority=()):
+        """
+        Queue the prerendering of a range of pages, and forget about the pages
+        that are outside of this range.
+
+        :param page_min: first page to keep in the cache
+        :type  page_min: integer
+        :param page_max: last page to keep in the cache
+        :type  page_max: integer
+        :param priority: page numbers to render before the others
+        :type  priority: sequence of integers
+        """
+        pages = [p for p in priority if page_min <= p <= page_max]
+        pages += [p for p in range(page_min, page_max + 1) if p not in pages]
+
+        with self.lock:
+            self.window = (page_min, page_max)
+            for key in [k for k in self.surface_cache if not page_min <= k[0] <= page_max]:
+                del self.surface_cache[key]
+            self.damage = {k: d for k, d in self.damage.items() if page_min <= k[0] <= page_max}
+
+            # Nobody waits for the pages that were left anymore
+            self.wanted = {k for k in self.wanted if page_min <= k[0] <= page_max}
+            for key, job in self.pending.items():
+                if not page_min <= key[0] <= page_max:
+                    job.cancel()
+
+            self.jobs = pages
+            self.lock.notify()
+
+    def lookup(self, widget_name, page_nb):
+        """
+        Fetch a rendered page from the cache, without rendering it.
+
+        :param widget_name: name of the concerned widget
+        :type  widget_name: string
+        :param page_nb: number of the page to fetch
+        :type  page_nb: integer
+        :return: the rendered page, or ``None`` if it is not in the cache
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        with self.lock:
+            width, height = self.surface_size[widget_name]
+            key = (page_nb, width, height, self.surface_type[widget_name])
+            surface = self.surface_cache.get(key)
+            if surface is not None:
+                self.hits += 1
+            elif width > 0 and height > 0:
+                self.misses += 1
+            return surface
+
+    def request(self, widget_name, page_nb):
+        """
+        Render a page in the background before any other one, and call
+        :attr:`on_ready` once it is in the cache. The request is dropped if the
+        page leaves the prerendering window in the meantime.
+
+        :param widget_name: name of the concerned widget
+        :type  widget_name: string
+        :param page_nb: number of the page to render
+        :type  page_nb: integer
+        """
+        with self.lock:
+            width, height = self.surface_size[widget_name]
+            key = (page_nb, width, height, self.surface_type[widget_name])
+            if width <= 0 or height <= 0 or key in self.surface_cache:
+                return
+
+            # After the pages requested earlier, before everything else
+            first = {k[0] for k in self.wanted}
+            self.jobs = ([p for p in self.jobs if p in first and p != page_nb] + [page_nb]
+                         + [p for p in self.jobs if p not in first and p != page_nb])
+            self.wanted.add(key)
+            self.lock.notify()
+
+    def draft(self, widget_name, page_nb, render=True):
+        """
+        Quickly get a low quality rendering of a page, to display while the
+        full rendering is not available. Another cached rendering of the page
+        is scaled if there is one, otherwise the page is rendered by Poppler at
+        a fraction of the resolution and without antialiasing.
+
+        The draft is not stored in the cache.
+
+        :param widget_name: name of the concerned widget
+        :type  widget_name: string
+        :param page_nb: number of the page
+        :type  page_nb: integer
+        :param render: ``False`` to only use the cached renderings of the page
+        :type  render: boolean
+        :return: the draft, or ``None`` if the widget has no size yet or there
+           is no cached rendering to use and ``render`` is ``False``
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        with self.lock:
+            width, height = self.surface_size[widget_name]
+            wtype = self.surface_type[widget_name]
+            others = [(k, s) for k, s in self.surface_cache.items()
+                      if k[0] == page_nb and k[3] == wtype]
+
+        if width <= 0 or height <= 0:
+            return None
+
+        if others:
+            key, source = max(others, key=lambda o: o[0][1] * o[0][2])
+            ratio = min(width / key[1], height / key[2])
+        elif not render:
+            return None
+        else:
+            # Use a private document, since a Poppler document must not be
+            # used by several threads at once
+            if self.draft_doc is None:
+                self.draft_doc = self.doc.new_poppler_document()
+            dw = max(1, int(width * self.draft_scale))
+            dh = max(1, int(height * self.draft_scale))
+            source = cairo.ImageSurface(cairo.FORMAT_RGB24, dw, dh)
+            cr = cairo.Context(source)
+            cr.set_antialias(cairo.ANTIALIAS_NONE)
+            document.Page(self.draft_doc, page_nb).render_cairo(cr, dw, dh, wtype)
+            source.flush()
+            ratio = min(width / dw, height / dh)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+        cr = cairo.Context(surface)
+        cr.scale(ratio, ratio)
+        cr.set_source_surface(source, 0, 0)
+        cr.get_source().set_filter(cairo.FILTER_FAST)
+        cr.paint()
+
+        surface.flush()
+        return surface
+
+    def get_damage(self, widget_name, page_a, page_b):
+        """
+        Get the region to repaint on a widget when switching between two
+        consecutive pages.
+
+        :param widget_name: name of the concerned widget
+        :type  widget_name: string
+        :param page_a: number of the displayed page
+        :type  page_a: integer
+        :param page_b: number of the page to display
+        :type  page_b: integer
+        :return: the region as a tuple ``(x, y, width, height)`` in pixels
+           (empty if nothing changes), or ``None`` if it is not known
+        :rtype: tuple
+        """
+        if abs(page_a - page_b) != 1:
+            return None
+        with self.lock:
+            key = (min(page_a, page_b),) + self.surface_size[widget_name] + (self.surface_type[widget_name],)
+            return self.damage.get(key)
+
+    def memory_usage(self):
+        """
+        Get the memory used by the cached surfaces.
+
+        :return: number of cached surfaces and their size in bytes
+        :rtype: (integer, integer)
+        """
+        with self.lock:
+            size = sum(s.get_stride() * s.get_height() for s in self.surface_cache.values())
+            return len(self.surface_cache), size
+
+    def invalidate(self, pages):
+        """
+        Forget the rendered surfaces of some pages (e.g. because they changed
+        in the PDF file), and prerender them again if they are in the window.
+
+        :param pages: numbers of the pages to invalidate
+        :type  pages: set of integers
+        """
+        if self.disk_cache is not None:
+            self.disk_cache.rehash()
+        if self.pool is not None:
+            self.pool.restart()
+
+        with self.lock:
+            self.generation += 1
+            self.pending = {}
+            self.draft_doc = None
+            self.render_doc = None
+            for key in [k for k in self.surface_cache if k[0] in pages]:
+                del self.surface_cache[key]
+            self.damage = {k: d for k, d in self.damage.items()
+                           if k[0] not in pages and k[0] + 1 not in pages}
+
+            page_min, page_max = self.window
+            self.jobs += [p for p in range(page_min, page_max + 1)
+                          if p in pages and p not in self.jobs]
+            self.lock.notify()
+
+    def warmup(self):
+        """
+        Render all the pages of the document in the background, at the sizes
+        of the current widgets, and save them in the disk cache. This needs both
+        a disk cache and worker processes.
+        """
+        if self.disk_cache is None or self.pool is None:
+            return
+
+        thread = threading.Thread(target=self._warmup, name="warmup")
+        thread.daemon = True
+        thread.start()
+
+    def _warmup(self):
+        """
+        Warmup thread: keeps the worker processes busy with pages that are
+        not in the disk cache yet. Only one page per worker is queued at a
+        time, so that pages needed by the GUI never wait behind the whole
+        document.
+        """
+        self.disk_cache.hashed.wait()
+
+        with self.lock:
+            generation = self.generation
+            specs = self._specs()
+            masters = {max([s for s in specs if s[2] == t], key=lambda s: s[0] * s[1])
+                       for t in {s[2] for s in specs}}
+
+        in_flight = collections.deque()
+
+        def save_oldest():
+            key, job = in_flight.popleft()
+            surface = job.result()
+            if surface is not None:
+                self._save(key, surface, generation)
+
+        for page_nb in range(self.doc.pages_number()):
+            for spec in masters:
+                key = (page_nb,) + spec
+                if generation != self.generation:
+                    return
+                if self.disk_cache.has(key):
+                    continue
+
+                in_flight.append((key, self.pool.submit(*key)))
+                if len(in_flight) >= self.pool.processes:
+                    save_oldest()
+
+        while in_flight:
+            save_oldest()
+
+    def renderer(self):
+        """
+        Rendering thread.
+
+        It waits for pages to be queued by :meth:`prerender` and renders them
+        for every size and type of widget for which they are not cached yet.
+        """
+        while True:
+            with self.lock:
+                while not self.jobs:
+                    self.lock.wait()
+
+                # With worker processes, take all the pages at once so that they
+                # are rendered in parallel
+                if self.pool is not None:
+                    pages, self.jobs = self.jobs, []
+                else:
+                    pages = [self.jobs.pop(0)]
+
+                # Largest sizes first, so that smaller ones are derived from them
+                specs = sorted(self._specs(), key=lambda s: s[0] * s[1], reverse=True)
+                todo = [(page_nb,) + spec for page_nb in pages for spec in specs]
+                todo = [key for key in todo if key not in self.surface_cache]
+                generation = self.generation
+
+            if self.pool is not None:
+                for key in todo:
+                    if self._master_key(key) == key and self._load(key) is None:
+                        self._submit(key)
+
+            for key in todo:
+                # Skip the pages that were left while rendering the others
+                if not self._needed(key):
+                    continue
+                self._store(key, self._produce(key, generation), generation)
+
+    def _specs(self):
+        """
+        Get the sizes and types for which pages have to be rendered. Must be
+        called with :attr:`lock` held.
+
+        :return: tuples ``(width, height, type)`` of the sized widgets
+        :rtype: set of tuples
+        """
+        return {size + (self.surface_type[name],)
+                for name, size in self.surface_size.items()
+                if size[0] > 0 and size[1] > 0}
+
+    def _needed(self, key):
+        """
+        Tell if a page still has to be rendered, i.e. if it is in the
+        prerendering window or it was requested with :meth:`request`.
+
+        :param key: page number, width, height and type of the page
+        :type  key: tuple
+        :return: ``True`` if the page is needed
+        :rtype: boolean
+        """
+        with self.lock:
+            page_min, page_max = self.window
+            return page_min <= key[0] <= page_max or key in self.wanted
+
+    def _spec_changed(self):
+        """
+        Drop the entries that no widget can use anymore after a change of size
+        or type, and prerender the current window again. Must be called with
+        :attr:`lock` held.
+        """
+        specs = self._specs()
+        for key in [k for k in self.surface_cache if k[1:] not in specs]:
+            del self.surface_cache[key]
+
+        page_min, page_max = self.window
+        self.jobs += [p for p in range(page_min, page_max + 1) if p not in self.jobs]
+        self.lock.notify()
+
+    def _master_key(self, key):
+        """
+        Get the key of the surface from which a page should be derived, i.e.
+        the same page rendered for the largest widget of the same type.
+
+        :param key: page number, width, height and type of the wanted page
+        :type  key: tuple
+        :return: page number, width, height and type of the master surface
+        :rtype: tuple
+        """
+        with self.lock:
+            specs = [s for s in self._specs() if s[2] == key[3]]
+        if not specs:
+            return key
+        return (key[0],) + max(specs, key=lambda s: s[0] * s[1])
+
+    def _produce(self, key, generation):
+        """
+        Get a new surface for a page, preferably by downscaling its master
+        surface (rendering and caching the master first if needed), or by
+        rendering it with Poppler if it cannot be derived.
+
+        :param key: page number, width, height and type of the wanted page
+        :type  key: tuple
+        :param generation: value of :attr:`generation` when the rendering
+           was requested
+        :type  generation: integer
+        :return: the rendered page, or ``None`` if its rendering was cancelled
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        surface = self._load(key)
+        if surface is not None:
+            return surface
+
+        master_key = self._master_key(key)
+        if master_key != key:
+            with self.lock:
+                master = self.surface_cache.get(master_key)
+            if master is None:
+                master = self._load(master_key)
+            if master is None:
+                master = self._render(*master_key)
+                if master is None:
+                    return None
+                self._save(master_key, master, generation)
+            self._store(master_key, master, generation)
+
+            surface = self._downscale(master, master_key, key)
+            if surface is not None:
+                self._save(key, surface, generation)
+                return surface
+
+        surface = self._render(*key)
+        self._save(key, surface, generation)
+        return surface
+
+    def _load(self, key):
+        """
+        Load a rendered page from the disk cache, if there is one.
+
+        :param key: page number, width, height and type of the wanted page
+        :type  key: tuple
+        :return: the rendered page, or ``None`` if it is not on disk
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        if self.disk_cache is None:
+            return None
+        return self.disk_cache.load(key)
+
+    def _save(self, key, surface, generation):
+        """
+        Save a rendered page to the disk cache, if there is one and the cache
+        was not invalidated during the rendering.
+
+        :param key: page number, width, height and type of the rendered page
+        :type  key: tuple
+        :param surface: the rendered page
+        :type  surface: :class:`cairo.ImageSurface`
+        :param generation: value of :attr:`generation` when the rendering
+           was requested
+        :type  generation: integer
+        """
+        if self.disk_cache is not None and surface is not None and generation == self.generation:
+            self.disk_cache.save(key, surface)
+
+    def _downscale(self, master, master_key, key):
+        """
+        Derive a smaller rendering of a page from a larger one.
+
+        :param master: the larger rendering of the page
+        :type  master: :class:`cairo.ImageSurface`
+        :param master_key: page number, width, height and type of ``master``
+        :type  master_key: tuple
+        :param key: page number, width, height and type of the wanted page
+        :type  key: tuple
+        :return: the downscaled page, or ``None`` if ``master`` is not large
+           enough (which happens when the widgets have different aspect ratios)
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        page_nb, width, height, wtype = key
+        page = self.doc.page(page_nb)
+        if page is None:
+            return None
+        pw, ph = page.get_size(wtype)
+
+        ratio = min(width / pw, height / ph) / min(master_key[1] / pw, master_key[2] / ph)
+        if ratio > 1:
+            return None
+
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+        cr = cairo.Context(surface)
+        cr.scale(ratio, ratio)
+        cr.set_source_surface(master, 0, 0)
+        cr.get_source().set_filter(cairo.FILTER_GOOD)
+        cr.paint()
+
+        surface.flush()
+        return surface
+
+    def _render(self, page_nb, width, height, wtype):
+        """
+        Render a page on a new off-screen surface.
+
+        :param page_nb: number of the page to render
+        :type  page_nb: integer
+        :param width: width of the surface
+        :type  width: integer
+        :param height: height of the surface
+        :type  height: integer
+        :param wtype: type of document to render
+        :type  wtype: integer
+        :return: the rendered page, or ``None`` if the page was left while
+           waiting for the worker processes
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        if self.pool is not None:
+            key = (page_nb, width, height, wtype)
+            job = self._submit(key)
+            surface = job.result()
+            with self.lock:
+                if self.pending.get(key) is job:
+                    del self.pending[key]
+            if surface is not None:
+                return surface
+            # The job was cancelled or failed: render locally if it is needed
+            if not self._needed(key):
+                return None
+
+        render_doc = self._render_doc()
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+        cr = cairo.Context(surface)
+        if page_nb < render_doc.get_n_pages():
+            document.Page(render_doc, page_nb).render_cairo(cr, width, height, wtype)
+        surface.flush()
+
+        # Parse the links now rather than on the first mouse move
+        page = self.doc.page(page_nb)
+        if page is not None:
+            page.get_links()
+
+        return surface
+
+    def _render_doc(self):
+        """
+        Get the private Poppler document of the rendering thread, opening it if
+        needed.
+
+        :return: the Poppler document to render from
+        :rtype: :class:`Poppler.Document`
+        """
+        with self.lock:
+            if self.render_doc is None:
+                self.render_doc = self.doc.new_poppler_document()
+            return self.render_doc
+
+    def _submit(self, key):
+        """
+        Start rendering a page in the worker processes, unless it is already
+        being rendered.
+
+        :param key: page number, width, height and type of the page
+        :type  key: tuple
+        :return: the rendering job
+        :rtype: :class:`~pympress.renderpool.RenderJob`
+        """
+        with self.lock:
+            job = self.pending.get(key)
+            if job is None:
+                job = self.pool.submit(*key)
+                self.pending[key] = job
+            return job
+
+    def _store(self, key, surface, generation):
+        """
+        Add a freshly rendered page to the cache, unless no widget needs this
+        size and type anymore, the page left the prerendering window (and was
+        not requested) or the cache was invalidated during the rendering.
+        :attr:`on_ready` is called if the page was requested.
+
+        :param key: page number, width, height and type of the rendered page
+        :type  key: tuple
+        :param surface: the rendered page
+        :type  surface: :class:`cairo.ImageSurface`
+        :param generation: value of :attr:`generation` when the rendering
+           was requested
+        :type  generation: integer
+        """
+        with self.lock:
+            if surface is None or generation != self.generation:
+                return
+            page_min, page_max = self.window
+            wanted = key in self.wanted
+            if not (wanted or page_min <= key[0] <= page_max) or key[1:] not in self._specs():
+                return
+            self.surface_cache[key] = surface
+            self.wanted.discard(key)
+
+        if wanted and self.on_ready is not None:
+            self.on_ready(key)
+
+        # Whatever produced the surface, remember what the page looked like,
+        # to detect changes of its drawings when the file is reloaded
+        render_doc = self._render_doc()
+        if key[0] < render_doc.get_n_pages():
+            self.doc.record_drawing(render_doc, key[0])
+
+        for first in [key[0] - 1, key[0]]:
+            self._record_damage((first,) + key[1:], generation)
+
+    def _record_damage(self, key, generation):
+        """
+        Compute and record the region where a page differs from the next one,
+        if both are in the cache at the same size and type.
+
+        :param key: page number, width, height and type of the first page
+        :type  key: tuple
+        :param generation: value of :attr:`generation` when the pages were
+           rendered
+        :type  generation: integer
+        """
+        with self.lock:
+            if key in self.damage:
+                return
+            a = self.surface_cache.get(key)
+            b = self.surface_cache.get((key[0] + 1,) + key[1:])
+        if a is None or b is None:
+            return
+
+        rect = diff_rect(a, b)
+        with self.lock:
+            if generation == self.generation:
+                self.damage[key] = rect
+
+
+class ThumbnailCache:
+    """
+    Small renderings of the pages, for the overview grid.
+
+    Thumbnails are kept apart from the :class:`PixbufCache`, in a bounded LRU
+    cache, and are rendered in a background thread with a private
+    :class:`Poppler.Document`, so that they never delay the pages displayed in
+    the drawing areas.
+    """
+
+    #: Maximum size of the thumbnails in device pixels, as a tuple
+    #: ``(width, height)``
+    size = (0, 0)
+    #: Type of document rendered in the thumbnails
+    wtype = 0
+    #: Maximum number of thumbnails kept in memory
+    max_size = 200
+    #: Rendered thumbnails, as an :class:`collections.OrderedDict` mapping page
+    #: numbers to :class:`cairo.ImageSurface` instances, least recently used
+    #: first
+    thumbnails = None
+    #: Page numbers waiting to be rendered, most urgent first
+    jobs = []
+    #: :class:`threading.Condition` protecting the thumbnails and the job list
+    lock = None
+    #: Current :class:`~pympress.document.Document` instance
+    doc = None
+    #: Private :class:`Poppler.Document` used by the rendering thread
+    poppler_doc = None
+    #: Counter increased whenever the thumbnails are dropped, so that
+    #: thumbnails rendered before are not stored
+    generation = 0
+    #: Function called with the page number of every new thumbnail. It is
+    #: called from the rendering thread.
+    on_ready = None
+
+    def __init__(self, doc, width, height, wtype, max_size=None):
+        """
+        :param doc: the current document
+        :type  doc: :class:`pympress.document.Document`
+        :param width: maximum width of the thumbnails
+        :type  width: integer
+        :param height: maximum height of the thumbnails
+        :type  height: integer
+        :param wtype: type of document to render
+        :type  wtype: integer
+        :param max_size: maximum number of thumbnails kept in memory, or
+           ``None`` to use the default
+        :type  max_size: integer
+        """
+        self.doc = doc
+        self.size = (width, height)
+        self.wtype = wtype
+        if max_size is not None:
+            self.max_size = max_size
+        self.thumbnails = collections.OrderedDict()
+        self.jobs = []
+        self.lock = threading.Condition()
+        self.generation = 0
+
+        thread = threading.Thread(target=self.renderer, name="thumbnails")
+        thread.daemon = True
+        thread.start()
+
+    def get(self, page_nb):
+        """
+        Get the thumbnail of a page, if it is rendered.
+
+        :param page_nb: number of the page
+        :type  page_nb: integer
+        :return: the thumbnail, or ``None`` if it is not rendered yet
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        with self.lock:
+            surface = self.thumbnails.get(page_nb)
+            if surface is not None:
+                self.thumbnails.move_to_end(page_nb)
+            return surface
+
+    def request(self, pages):
+        """
+        Set the pages whose thumbnails are needed, replacing the previous
+        request. Thumbnails that are already rendered are skipped. At most
+        :attr:`max_size` pages are considered, so that the thumbnails of a
+        request never evict each other.
+
+        :param pages: page numbers, most urgent first
+        :type  pages: list of integers
+        """
+        with self.lock:
+            pages = pages[:self.max_size]
+            for page_nb in pages:
+                if page_nb in self.thumbnails:
+                    self.thumbnails.move_to_end(page_nb)
+            self.jobs = [p for p in pages if p not in self.thumbnails]
+            self.lock.notify()
+
+    def set_size(self, width, height):
+        """
+        Change the maximum size of the thumbnails (e.g. after a change of scale
+        factor), dropping all of them if it changed.
+
+        :param width: maximum width of the thumbnails, in device pixels
+        :type  width: integer
+        :param height: maximum height of the thumbnails, in device pixels
+        :type  height: integer
+        """
+        with self.lock:
+            if (width, height) != self.size:
+                self.size = (width, height)
+                self._clear()
+
+    def set_type(self, wtype):
+        """
+        Change the type of document rendered in the thumbnails, dropping all of
+        them if it changed.
+
+        :param wtype: type of document to render
+        :type  wtype: integer
+        """
+        with self.lock:
+            if wtype != self.wtype:
+                self.wtype = wtype
+                self._clear()
+
+    def invalidate(self, pages):
+        """
+        Forget the thumbnails of some pages, e.g. because they changed in the
+        PDF file.
+
+        :param pages: numbers of the pages to invalidate
+        :type  pages: set of integers
+        """
+        with self.lock:
+            self.generation += 1
+            self.poppler_doc = None
+            for page_nb in [p for p in self.thumbnails if p in pages]:
+                del self.thumbnails[page_nb]
+            # The document may have fewer pages now
+            self.jobs = [p for p in self.jobs if p < self.doc.pages_number()]
+
+    def memory_usage(self):
+        """
+        Get the memory used by the thumbnails.
+
+        :return: number of thumbnails and their size in bytes
+        :rtype: (integer, integer)
+        """
+        with self.lock:
+            size = sum(s.get_stride() * s.get_height() for s in self.thumbnails.values())
+            return len(self.thumbnails), size
+
+    def _clear(self):
+        """
+        Drop all the thumbnails and the pending jobs. Must be called with
+        :attr:`lock` held.
+        """
+        self.generation += 1
+        self.thumbnails.clear()
+        self.jobs = []
+
+    def renderer(self):
+        """
+        Rendering thread: renders the requested thumbnails one at a time.
+        """
+        while True:
+            with self.lock:
+                while not self.jobs:
+                    self.lock.wait()
+                page_nb = self.jobs.pop(0)
+                generation = self.generation
+                width, height = self.size
+                wtype = self.wtype
+                if self.poppler_doc is None:
+                    self.poppler_doc = self.doc.new_poppler_document()
+                poppler_doc = self.poppler_doc
+                if page_nb >= poppler_doc.get_n_pages():
+                    continue
+
+            page = document.Page(poppler_doc, page_nb)
+            pw, ph = page.get_size(wtype)
+            scale = min(width / pw, height / ph)
+            tw, th = max(1, int(pw * scale)), max(1, int(ph * scale))
+
+            surface = cairo.ImageSurface(cairo.FORMAT_RGB24, tw, th)
+            cr = cairo.Context(surface)
+            page.render_cairo(cr, tw, th, wtype)
+            surface.flush()
+
+            with self.lock:
+                if generation != self.generation:
+                    continue
+                self.thumbnails[page_nb] = surface
+                while len(self.thumbnails) > self.max_size:
+                    self.thumbnails.popitem(last=False)
+
+            self.doc.record_drawing(poppler_doc, page_nb)
+
+            if self.on_ready is not None:
+                self.on_ready(page_nb)
@@ -0,0 +1,279 @@
+#       renderpool.py
+#
+#       Copyright 2014 Julien Enselme <jujens@jujens.eu>
+#
+#       This program is free software; you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation; either version 2 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program; if not, write to the Free Software
+#       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#       MA 02110-1301, USA.
+
+"""
+:mod:`pympress.renderpool` -- Multi-process rendering
+-----------------------------------------------------
+
+Poppler renders a page on a single core. This module contains the
+:class:`~pympress.renderpool.RenderPool` class, which renders pages in parallel
+in a pool of worker processes, each one with its own :class:`Poppler.Document`.
+
+Workers render directly into shared memory (a file in :file:`/dev/shm`), which
+the GUI process maps and wraps in a :class:`cairo.ImageSurface`: pixels are
+never copied between processes.
+"""
+
+import concurrent.futures
+import itertools
+import mmap
+import multiprocessing
+import os, os.path
+import tempfile
+import threading
+
+import cairo
+
+#: Directory of the shared memory files
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+#: Poppler document of a worker process
+_worker_doc = None
+#: Counter used to name the shared memory files of a worker process
+_worker_counter = itertools.count()
+
+
+def _init_worker(uri, use_mmap):
+    """
+    Open the document in a worker process.
+
+    :param uri: URI to the PDF file
+    :type  uri: string
+    :param use_mmap: ``True`` to map the file in memory, sharing its pages with
+       the GUI process, ``False`` to let Poppler read the file
+    :type  use_mmap: boolean
+    """
+    global _worker_doc
+    from gi.repository import Poppler
+    if use_mmap and hasattr(Poppler.Document, "new_from_bytes"):
+        try:
+            from pympress import document
+        except ImportError:
+            import document
+        _worker_doc = Poppler.Document.new_from_bytes(document.Document.map_file(uri), None)
+    else:
+        _worker_doc = Poppler.Document.new_from_file(uri, None)
+
+
+def _render_page(page_nb, width, height, wtype):
+    """
+    Render a page into a new shared memory file, in a worker process.
+
+    :param page_nb: number of the page to render
+    :type  page_nb: integer
+    :param width: width of the surface
+    :type  width: integer
+    :param height: height of the surface
+    :type  height: integer
+    :param wtype: type of document to render
+    :type  wtype: integer
+    :return: path of the shared memory file
+    :rtype: string
+    """
+    try:
+        from pympress import document
+    except ImportError:
+        import document
+
+    size = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, width) * height
+    # Named after the GUI process too, see remove_stale_files()
+    path = os.path.join(SHM_DIR, "pympress-%d-%d-%d" % (os.getppid(), os.getpid(),
+                                                        next(_worker_counter)))
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        os.ftruncate(fd, size)
+        with mmap.mmap(fd, size) as mapping:
+            _render_into(mapping, document.Page(_worker_doc, page_nb), width, height, wtype)
+    except BaseException:
+        os.unlink(path)
+        raise
+    finally:
+        os.close(fd)
+
+    return path
+
+
+def _render_into(buf, page, width, height, wtype):
+    """
+    Render a page into a pixel buffer. The Cairo objects are released on
+    return, so that the buffer can be closed.
+    """
+    stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, width)
+    surface = cairo.ImageSurface.create_for_data(buf, cairo.FORMAT_RGB24, width, height, stride)
+    cr = cairo.Context(surface)
+    page.render_cairo(cr, width, height, wtype)
+    surface.flush()
+    surface.finish()
+
+
+def remove_stale_files():
+    """
+    Remove the shared memory files left over by GUI processes that are not
+    running anymore. Files are normally removed as soon as the GUI maps them,
+    so they can only be left over if it crashed while pages were rendered.
+    """
+    for filename in os.listdir(SHM_DIR):
+        parts = filename.split("-")
+        if len(parts) != 4 or parts[0] != "pympress" or not parts[1].isdigit():
+            continue
+        try:
+            os.kill(int(parts[1]), 0)
+        except ProcessLookupError:
+            try:
+                os.unlink(os.path.join(SHM_DIR, filename))
+            except OSError:
+                pass
+        except OSError:
+            # The process exists, but belongs to another user
+            pass
+
+
+class RenderJob:
+    """A page being rendered by a :class:`~pympress.renderpool.RenderPool`."""
+
+    #: :class:`concurrent.futures.Future` of the worker process
+    future = None
+    #: Size of the rendered page, as a tuple ``(width, height)``
+    size = None
+    #: The rendered page once done, or ``None`` if cancelled or failed
+    surface = None
+    #: :class:`threading.Event` set when :attr:`surface` is available
+    done = None
+
+    def __init__(self, future, width, height):
+        """
+        :param future: the future returned by the process pool
+        :type  future: :class:`concurrent.futures.Future`
+        :param width: width of the page
+        :type  width: integer
+        :param height: height of the page
+        :type  height: integer
+        """
+        self.future = future
+        self.size = (width, height)
+        self.done = threading.Event()
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        """
+        Map the shared memory file as soon as the worker is done, and remove it
+        from the file system (the mapping stays valid until the surface is
+        released).
+        """
+        try:
+            if not future.cancelled():
+                path = future.result()
+                try:
+                    with open(path, "r+b") as f:
+                        mapping = mmap.mmap(f.fileno(), 0)
+                finally:
+                    os.unlink(path)
+
+                width, height = self.size
+                stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_RGB24, width)
+                self.surface = cairo.ImageSurface.create_for_data(mapping, cairo.FORMAT_RGB24,
+                                                                  width, height, stride)
+        except Exception as e:
+            print("Rendering failed: %s" % e)
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        """
+        Cancel the job if it did not start yet.
+
+        :return: ``True`` if the job was cancelled
+        :rtype: boolean
+        """
+        return self.future.cancel()
+
+    def result(self):
+        """
+        Wait for the job to finish.
+
+        :return: the rendered page, or ``None`` if it was cancelled or failed
+        :rtype: :class:`cairo.ImageSurface`
+        """
+        self.done.wait()
+        return self.surface
+
+
+class RenderPool:
+    """Pool of worker processes rendering pages in parallel."""
+
+    #: URI of the rendered document
+    uri = None
+    #: Number of worker processes
+    processes = 0
+    #: Whether the workers map the document in memory
+    use_mmap = False
+    #: :class:`concurrent.futures.ProcessPoolExecutor` running the workers
+    executor = None
+
+    def __init__(self, uri, processes=None, use_mmap=False):
+        """
+        :param uri: URI to the PDF file
+        :type  uri: string
+        :param processes: number of worker processes, or ``None`` for one per
+           CPU core
+        :type  processes: integer
+        :param use_mmap: ``True`` to map the file in memory in the workers (see
+           :meth:`pympress.document.Document.map_file`)
+        :type  use_mmap: boolean
+        """
+        self.uri = uri
+        self.processes = processes or os.cpu_count() or 1
+        self.use_mmap = use_mmap
+        remove_stale_files()
+        self.start()
+
+    def start(self):
+        """Start the worker processes."""
+        # Forking a process which runs GTK is not safe
+        context = multiprocessing.get_context("spawn")
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.processes, mp_context=context,
+            initializer=_init_worker, initargs=(self.uri, self.use_mmap))
+
+    def restart(self):
+        """
+        Replace the worker processes, e.g. so that they open the document again
+        after it changed. Jobs that did not start yet are cancelled.
+        """
+        executor = self.executor
+        self.start()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, page_nb, width, height, wtype):
+        """
+        Queue the rendering of a page.
+
+        :param page_nb: number of the page to render
+        :type  page_nb: integer
+        :param width: width of the surface
+        :type  width: integer
+        :param height: height of the surface
+        :type  height: integer
+        :param wtype: type of document to render
+        :type  wtype: integer
+        :return: the rendering job
+        :rtype: :class:`~pympress.renderpool.RenderJob`
+        """
+        future = self.executor.submit(_render_page, page_nb, width, height, wtype)
+        return RenderJob(future, width, height)
@@ -0,0 +1,169 @@
+#       search.py
+#
+#       Copyright 2014 Julien Enselme <jujens@jujens.eu>
+#
+#       This program is free software; you can redistribute it and/or modify
+#       it under the terms of the GNU General Public License as published by
+#       the Free Software Foundation; either version 2 of the License, or
+#       (at your option) any later version.
+#
+#       This program is distributed in the hope that it will be useful,
+#       but WITHOUT ANY WARRANTY; without even the implied warranty of
+#       MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#       GNU General Public License for more details.
+#
+#       You should have received a copy of the GNU General Public License
+#       along with this program; if not, write to the Free Software
+#       Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#       MA 02110-1301, USA.
+
+"""
+:mod:`pympress.search` -- Full-text search
+------------------------------------------
+
+This module contains the :class:`~pympress.search.SearchPanel` class, used in
+the Presenter window to find pages by their text. Queries are answered by the
+:class:`~pympress.document.TextIndex` of the document, while it is being built
+in the background.
+"""
+
+from gi.repository import Gtk
+from gi.repository import GLib
+
+
+class SearchPanel:
+    """Search entry and list of matching pages."""
+
+    #: Current :class:`~pympress.document.Document` instance
+    doc = None
+    #: Function called with a page number when a result is chosen
+    on_select = None
+    #: :class:`Gtk.VBox` holding the panel, to add to a window
+    widget = None
+    #: :class:`Gtk.Entry` of the query
+    entry = None
+    #: :class:`Gtk.Label` showing the number of results
+    status = None
+    #: :class:`Gtk.ListStore` of the results: page number and markup
+    results = None
+    #: :class:`Gtk.TreeView` showing :attr:`results`
+    view = None
+
+    def __init__(self, doc, on_select):
+        """
+        :param doc: the current document
+        :type  doc: :class:`pympress.document.Document`
+        :param on_select: function called with a page number when a result is
+           chosen
+        :type  on_select: callable
+        """
+        self.doc = doc
+        self.on_select = on_select
+
+        self.entry = Gtk.Entry()
+        self.entry.set_placeholder_text("Search the slides")
+        self.entry.connect("changed", self.on_changed)
+        self.entry.connect("activate", self.on_activate)
+
+        self.status = Gtk.Label()
+        self.status.set_alignment(0, 0.5)
+
+        self.results = Gtk.ListStore(int, str)
+        self.view = Gtk.TreeView(self.results)
+        self.view.set_headers_visible(False)
+        self.view.append_column(Gtk.TreeViewColumn("Page", Gtk.CellRendererText(), markup=1))
+        self.view.connect("row-activated", self.on_row_activated)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(self.view)
+
+        self.widget = Gtk.VBox(False, 6)
+        self.widget.pack_start(self.entry, False, False, 0)
+        self.widget.pack_start(self.status, False, False, 0)
+        self.widget.pack_start(scrolled, True, True, 0)
+        self.widget.set_no_show_all(True)
+
+    def show(self, height):
+        """
+        Show the panel and focus the search entry.
+
+        :param height: height of the panel, in pixels
+        :type  height: integer
+        """
+        self.widget.set_size_request(-1, height)
+        self.widget.show_all()
+        self.entry.grab_focus()
+        self.entry.select_region(0, -1)
+        self.update()
+
+    def hide(self):
+        """Hide the panel."""
+        self.widget.hide()
+
+    def has_focus(self):
+        """
+        Tell if the panel has the keyboard focus, either in the search entry or
+        in the list of results.
+
+        :return: ``True`` if the panel is shown and one of its widgets is
+           focused
+        :rtype: boolean
+        """
+        if not self.widget.get_visible():
+            return False
+        focus = self.widget.get_toplevel().get_focus()
+        return focus is not None and focus.is_ancestor(self.widget)
+
+    def update(self):
+        """Search the current query and list the results."""
+        query = self.entry.get_text()
+        found = self.doc.text_index.search(query)
+
+        self.results.clear()
+        for page_nb, excerpt, matches in found:
+            markup, pos = [], 0
+            for start, end in matches:
+                markup.append(GLib.markup_escape_text(excerpt[pos:start]))
+                markup.append("<b>%s</b>" % GLib.markup_escape_text(excerpt[start:end]))
+                pos = end
+            markup.append(GLib.markup_escape_text(excerpt[pos:]))
+            self.results.append([page_nb, "<b>%d</b>\t%s" % (page_nb + 1, "".join(markup))])
+
+        indexed, total = self.doc.text_index.progress()
+        status = "%d result%s" % (len(found), "" if len(found) == 1 else "s") if query else ""
+        if indexed < total:
+            status += " (%d/%d pages indexed)" % (indexed, total)
+        self.status.set_text(status)
+
+    def on_changed(self, entry):
+        """
+        Search again when the query changes.
+
+        :param entry: the search entry
+        :type  entry: :class:`Gtk.Entry`
+        """
+        self.update()
+
+    def on_activate(self, entry):
+        """
+        Choose the first result when Return is pressed in the entry.
+
+        :param entry: the search entry
+        :type  entry: :class:`Gtk.Entry`
+        """
+        if len(self.results):
+            self.on_select(self.results[0][0])
+
+    def on_row_activated(self, view, path, column):
+        """
+        Choose the activated result.
+
+        :param view: the list of results
+        :type  view: :class:`Gtk.TreeView`
+        :param path: path of the activated row
+        :type  path: :class:`Gtk.TreePath`
+        :param column: activated column
+        :type  column: :class:`Gtk.TreeViewColumn`
+        """
+        self.on_select(self.results[path][0])
@@ -36,54 +36,70 @@ import pkg_resources
 
 from gi.repository import Gtk
 from gi.repository import Pango
-from gi.repository import GLib, GdkPixbuf
+from gi.repository import GLib
 from gi.repository import Gdk
 
 try:
+    from pympress import pixbufcache
+    from pympress import overview
+    from pympress import search
     from pympress import util
+
+    from pympress.document import PDF_REGULAR, PDF_CONTENT_PAGE, PDF_NOTES_PAGE
 except ImportError:
+    import pixbufcache
+    import overview
+    import search
     import util
-
-#: "Regular" PDF file (without notes)
-PDF_REGULAR = 0
-#: Content page (left side) of a PDF file with notes
-PDF_CONTENT_PAGE = 1
-#: Notes page (right side) of a PDF file with notes
-PDF_NOTES_PAGE = 2
+    from document import PDF_REGULAR, PDF_CONTENT_PAGE, PDF_NOTES_PAGE
 
 
 class UI:
     """Pympress GUI management."""
 
+    # The widgets are only built by :meth:`__init__`, so that importing this
+    # module stays cheap.
+
     #: Content window, as a :class:`Gtk.Window` instance.
-    c_win = Gtk.Window(Gtk.WindowType.TOPLEVEL)
+    c_win = None
     #: :class:`~Gtk.AspectFrame` for the Content window.
-    c_frame = Gtk.AspectFrame(ratio=4./3., obey_child=False)
+    c_frame = None
     #: :class:`~Gtk.DrawingArea` for the Content window.
-    c_da = Gtk.DrawingArea()
+    c_da = None
 
     #: :class:`~Gtk.AspectFrame` for the current slide in the Presenter window.
-    p_frame_cur = Gtk.AspectFrame(yalign=1, ratio=4./3., obey_child=False)
+    p_frame_cur = None
     #: :class:`~Gtk.DrawingArea` for the current slide in the Presenter window.
-    p_da_cur = Gtk.DrawingArea()
+    p_da_cur = None
     #: Slide counter :class:`~Gtk.Label` for the current slide.
-    label_cur = Gtk.Label()
+    label_cur = None
     #: :class:`~Gtk.EventBox` associated with the slide counter label in the Presenter window.
-    eb_cur = Gtk.EventBox()
+    eb_cur = None
     #: :class:`~Gtk.Entry` used to switch to another slide by typing its number.
-    entry_cur = Gtk.Entry()
+    entry_cur = None
 
     #: :class:`~Gtk.AspectFrame` for the next slide in the Presenter window.
-    p_frame_next = Gtk.AspectFrame(yalign=1, ratio=4./3., obey_child=False)
+    p_frame_next = None
     #: :class:`~Gtk.DrawingArea` for the next slide in the Presenter window.
-    p_da_next = Gtk.DrawingArea()
+    p_da_next = None
     #: Slide counter :class:`~Gtk.Label` for the next slide.
-    label_next = Gtk.Label()
+    label_next = None
+
+    #: Current section :class:`~Gtk.Label`, below the current slide counter.
+    label_section = None
+    #: Outline panel :class:`~Gtk.Expander`, hidden if the document has no
+    #: outline.
+    outline_expander = None
+    #: :class:`~Gtk.TreeStore` of the outline: title and page number (-1 for
+    #: entries without a page).
+    outline_store = None
+    #: :class:`~pympress.document.Outline` displayed in :attr:`outline_store`
+    outline_shown = None
 
     #: Elapsed time :class:`~Gtk.Label`.
-    label_time = Gtk.Label()
+    label_time = None
     #: Clock :class:`~Gtk.Label`.
-    label_clock = Gtk.Label()
+    label_clock = None
 
     #: Time at which the counter was started.
     start_time = 0
@@ -91,18 +107,87 @@ class UI:
     delta = 0
     #: Timer paused status.
     paused = True
+    #: Text currently displayed by :attr:`label_time`
+    time_text = None
+    #: Text currently displayed by :attr:`label_clock`
+    clock_text = None
+    #: GLib source id of the next update of the timer and clock
+    clock_source = None
 
     #: Fullscreen toggle. By default, don't start in fullscreen mode.
     fullscreen = False
 
-    #: Current :class:`~pympress.document.Document` instance.
+    #: Current :class:`~pympress.document.Document` instance, or ``None``
+    #: while the document is being loaded.
     doc = None
+    #: "Notes mode" :class:`~Gtk.ToggleAction`, synchronized with the document
+    #: once it is loaded.
+    notes_action = None
+
+    #: Link hit maps of the drawing areas, as a dictionary mapping widget names
+    #: to tuples ``(page number, width, height, LinkIndex)``. They are dropped
+    #: when the page changes or the widget is resized.
+    hit_maps = {}
+    #: Whether the pointer is over a link, for each drawing area
+    link_hover = {}
+    #: Last motion event waiting to be handled, as a tuple ``(widget, x, y)``
+    pending_motion = None
+    #: Cursor displayed over links (created once, see :meth:`on_link`)
+    hand_cursor = None
+
+    #: :class:`~pympress.pixbufcache.PixbufCache` instance, holding the
+    #: prerendered pages of the three drawing areas.
+    cache = None
+
+    #: Time of the last page change, as given by :func:`time.perf_counter`
+    last_page_change = 0
+    #: Delay in milliseconds without page change after which a burst of page
+    #: changes (e.g. a held key) is considered over
+    settle_delay = 150
+    #: GLib source id of the timeout ending the current burst, or ``None``
+    settle_source = None
+    #: Final rendering displayed by each drawing area, as a dictionary mapping
+    #: widget names to tuples ``(page number, width, height, type)``, or to
+    #: ``None`` while a draft is displayed
+    displayed = {}
+    #: Last surface painted on each drawing area, as a dictionary mapping widget
+    #: names to :class:`cairo.ImageSurface`, painted again by ``draw`` signals
+    #: while navigating quickly over pages that are not rendered yet
+    painted = {}
 
     #: Whether to use notes mode or not
     notes_mode = False
 
-    def __init__(self, doc):
+    #: Timings of the drawing areas and of :meth:`on_page_change`, as a
+    #: dictionary of :class:`~pympress.util.RollingStats`
+    stats = {}
+    #: Performance HUD :class:`~Gtk.Label`, overlaid on the Presenter window
+    hud = None
+    #: GLib source id of the timeout updating :attr:`hud`, or ``None``
+    hud_source = None
+
+    #: :class:`~pympress.overview.Overview` grid of the Presenter window,
+    #: created once the document is loaded
+    overview = None
+    #: "Overview" :class:`~Gtk.ToggleAction`
+    overview_action = None
+    #: :class:`~pympress.search.SearchPanel` of the Presenter window, created
+    #: once the document is loaded
+    search_panel = None
+    #: "Search" :class:`~Gtk.Action`
+    search_action = None
+    #: Box of the Presenter window holding either :attr:`p_table` or the
+    #: overview grid
+    p_box = None
+    #: Container of the usual content of the Presenter window (slides, timer
+    #: and clock), hidden while the overview grid is shown
+    p_table = None
+
+    def __init__(self, doc=None):
         """
+        Build and show both windows. If no document is given, the windows show
+        a placeholder until :meth:`set_document` is called.
+
         :param doc: the current document
         :type  doc: :class:`pympress.document.Document`
         """
@@ -111,8 +196,25 @@ class UI:
         # Common to both windows
         icon_list = util.load_icons()
 
-        # Use notes mode by default if the document has notes
-        self.notes_mode = doc.has_notes()
+        # Widgets
+        self.c_win = Gtk.Window(Gtk.WindowType.TOPLEVEL)
+        self.c_frame = Gtk.AspectFrame(ratio=4./3., obey_child=False)
+        self.c_da = Gtk.DrawingArea()
+        self.p_frame_cur = Gtk.AspectFrame(yalign=1, ratio=4./3., obey_child=False)
+        self.p_da_cur = Gtk.DrawingArea()
+        self.label_cur = Gtk.Label()
+        self.eb_cur = Gtk.EventBox()
+        self.entry_cur = Gtk.Entry()
+        self.p_frame_next = Gtk.AspectFrame(yalign=1, ratio=4./3., obey_child=False)
+        self.p_da_next = Gtk.DrawingArea()
+        self.label_next = Gtk.Label()
+        self.label_time = Gtk.Label()
+        self.label_clock = Gtk.Label()
+
+        self.stats = {name: util.RollingStats()
+                      for name in ["c_da", "p_da_cur", "p_da_next", "on_page_change"]}
+        self.displayed = {}
+        self.painted = {}
 
         # Content window
         self.c_win.set_title("pympress content")
@@ -125,6 +227,7 @@ class UI:
 
         self.c_da.modify_bg(Gtk.StateFlags.NORMAL, black)
         self.c_da.connect("draw", self.on_expose)
+        self.c_da.connect("notify::scale-factor", self.on_scale_change)
         self.c_da.set_name("c_da")
 
         self.c_frame.add(self.c_da)
@@ -160,6 +263,8 @@ class UI:
             <menuitem action="Reset timer"/>
             <menuitem action="Fullscreen"/>
             <menuitem action="Notes mode"/>
+            <menuitem action="Overview"/>
+            <menuitem action="Search"/>
           </menu>
           <menu action="Help">
             <menuitem action="About"/>
@@ -181,14 +286,21 @@ class UI:
 
             ("Quit", Gtk.STOCK_QUIT, "_Quit", "q", None, Gtk.main_quit),
             ("Reset timer", None, "_Reset timer", "r", None, self.reset_timer),
+            ("Search", Gtk.STOCK_FIND, "_Search", "<Control>f", None, self.open_search),
             ("About", None, "_About", None, None, self.menu_about),
         ])
         action_group.add_toggle_actions([
             ("Pause timer", None, "_Pause timer", "p", None, self.switch_pause, True),
             ("Fullscreen", None, "_Fullscreen", "f", None, self.switch_fullscreen, False),
             ("Notes mode", None, "_Note mode", "n", None, self.switch_mode, self.notes_mode),
+            ("Overview", None, "_Overview", "g", None, self.switch_overview, False),
         ])
         ui_manager.insert_action_group(action_group)
+        self.notes_action = action_group.get_action("Notes mode")
+        self.overview_action = action_group.get_action("Overview")
+        self.overview_action.set_sensitive(False)
+        self.search_action = action_group.get_action("Search")
+        self.search_action.set_sensitive(False)
 
         # Add menu bar to the window
         menubar = ui_manager.get_widget('/MenuBar')
@@ -202,11 +314,24 @@ class UI:
         align.set_padding(20, 20, 20, 20)
 
         # Table
-        table = Gtk.Table(2, 10, False)
+        table = Gtk.Table(3, 10, False)
         table.set_col_spacings(25)
         table.set_row_spacings(25)
         align.add(table)
-        bigvbox.pack_end(align, False, False, 0)
+
+        # Either the table or the overview grid, with the performance HUD on
+        # top of everything but the menu
+        self.p_table = align
+        self.p_box = Gtk.VBox()
+        self.p_box.pack_start(align, True, True, 0)
+        overlay = Gtk.Overlay()
+        overlay.add(self.p_box)
+        self.hud = Gtk.Label()
+        self.hud.set_halign(Gtk.Align.END)
+        self.hud.set_valign(Gtk.Align.START)
+        self.hud.set_no_show_all(True)
+        overlay.add_overlay(self.hud)
+        bigvbox.pack_end(overlay, False, False, 0)
 
         # "Current slide" frame
         frame = Gtk.Frame()
@@ -222,8 +347,13 @@ class UI:
         self.eb_cur.set_visible_window(False)
         self.eb_cur.connect("event", self.on_label_event)
         vbox.pack_start(self.eb_cur, False, False, 10)
+        self.label_section = Gtk.Label()
+        self.label_section.set_ellipsize(Pango.EllipsizeMode.END)
+        self.label_section.set_max_width_chars(60)
+        vbox.pack_start(self.label_section, False, False, 0)
         self.p_da_cur.modify_bg(Gtk.StateFlags.NORMAL, black)
         self.p_da_cur.connect("draw", self.on_expose)
+        self.p_da_cur.connect("notify::scale-factor", self.on_scale_change)
         self.p_da_cur.set_name("p_da_cur")
         self.p_da_cur.set_size_request(0, 400)  #FIXME: size of preview is fixed
         self.p_frame_cur.add(self.p_da_cur)
@@ -251,6 +381,7 @@ class UI:
         vbox.pack_end(self.p_frame_next, False, False, 0)
         self.p_da_next.modify_bg(Gtk.StateFlags.NORMAL, black)
         self.p_da_next.connect("draw", self.on_expose)
+        self.p_da_next.connect("notify::scale-factor", self.on_scale_change)
         self.p_da_next.set_name("p_da_next")
         self.p_da_next.set_size_request(0, 290)  #FIXME: size of preview is fixed
         self.p_frame_next.add(self.p_da_next)
@@ -264,7 +395,6 @@ class UI:
         align.set_padding(10, 10, 12, 0)
         frame.add(align)
         self.label_time.set_justify(Gtk.Justification.CENTER)
-        self.label_time.set_use_markup(True)
         align.add(self.label_time)
 
         # "Clock" frame
@@ -276,9 +406,33 @@ class UI:
         align.set_padding(10, 10, 12, 0)
         frame.add(align)
         self.label_clock.set_justify(Gtk.Justification.CENTER)
-        self.label_clock.set_use_markup(True)
         align.add(self.label_clock)
 
+        # Fixed-width timer and clock, so that their updates never change the
+        # layout of the window: the minimum and natural widths are both set,
+        # which requires the labels to be ellipsizable
+        for label, chars in [(self.label_time, len("000:00 (pause)")),
+                             (self.label_clock, len("00:00:00"))]:
+            label.modify_font(Pango.FontDescription("monospace 36"))
+            label.set_width_chars(chars)
+            label.set_max_width_chars(chars)
+            label.set_ellipsize(Pango.EllipsizeMode.END)
+
+        # Outline panel, collapsed by default
+        self.outline_expander = Gtk.Expander(label="Outline")
+        table.attach(self.outline_expander, 0, 10, 2, 3, yoptions=Gtk.AttachOptions.FILL)
+        self.outline_store = Gtk.TreeStore(str, int)
+        outline_view = Gtk.TreeView(self.outline_store)
+        outline_view.set_headers_visible(False)
+        outline_view.append_column(Gtk.TreeViewColumn("Title", Gtk.CellRendererText(), text=0))
+        outline_view.connect("row-activated", self.on_outline_activated)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_size_request(-1, 200)
+        scrolled.add(outline_view)
+        self.outline_expander.add(scrolled)
+        self.outline_expander.set_no_show_all(True)
+
         p_win.connect("destroy", Gtk.main_quit)
         p_win.show_all()
 
@@ -290,31 +444,75 @@ class UI:
 
         # Hyperlinks if available
         if util.poppler_links_available():
-            self.c_da.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
-                                    Gdk.EventMask.POINTER_MOTION_MASK)
-            self.c_da.connect("button-press-event", self.on_link)
-            self.c_da.connect("motion-notify-event", self.on_link)
+            self.hit_maps = {}
+            self.link_hover = {}
+            self.hand_cursor = Gdk.Cursor.new(Gdk.CursorType.HAND2)
 
-            self.p_da_cur.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
-                                        Gdk.EventMask.POINTER_MOTION_MASK)
-            self.p_da_cur.connect("button-press-event", self.on_link)
-            self.p_da_cur.connect("motion-notify-event", self.on_link)
-
-            self.p_da_next.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
-                                        Gdk.EventMask.POINTER_MOTION_MASK)
-            self.p_da_next.connect("button-press-event", self.on_link)
-            self.p_da_next.connect("motion-notify-event", self.on_link)
+            for da in [self.c_da, self.p_da_cur, self.p_da_next]:
+                da.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
+                                Gdk.EventMask.POINTER_MOTION_MASK)
+                da.connect("button-press-event", self.on_link)
+                da.connect("motion-notify-event", self.on_link)
+                da.connect("size-allocate", self.on_resize)
 
         # Setup timer
-        GLib.timeout_add(250, self.update_time)
+        self.update_time()
+        self.schedule_clock()
 
-        # Document
-        self.doc = doc
+        # Placeholder until the document is loaded
+        self.label_cur.set_markup("<span font='36'>Loading...</span>")
 
         # Show all windows
         self.c_win.show_all()
         p_win.show_all()
 
+        if doc is not None:
+            self.set_document(doc)
+
+    def set_document(self, doc, disk_cache=None, render_pool=None):
+        """
+        Attach a document to the GUI and display its current page.
+
+        :param doc: the document to display
+        :type  doc: :class:`pympress.document.Document`
+        :param disk_cache: persistent cache of rendered pages to use, if any
+        :type  disk_cache: :class:`~pympress.diskcache.DiskCache`
+        :param render_pool: worker processes to render pages with, if any
+        :type  render_pool: :class:`~pympress.renderpool.RenderPool`
+        """
+        self.doc = doc
+        doc.ui = self
+        self.displayed.clear()
+        self.painted.clear()
+
+        # Cache and prerender the pages of the drawing areas
+        self.cache = pixbufcache.PixbufCache(doc, disk_cache, render_pool)
+        self.cache.add_widget("c_da", PDF_REGULAR)
+        self.cache.add_widget("p_da_cur", PDF_REGULAR)
+        self.cache.add_widget("p_da_next", PDF_REGULAR)
+        self.cache.on_ready = lambda key: GLib.idle_add(self.on_page_rendered, key)
+
+        # Overview grid, with its own thumbnails
+        self.overview = overview.Overview(doc, self.on_overview_select, PDF_REGULAR)
+        self.p_box.pack_start(self.overview.widget, True, True, 0)
+        self.overview_action.set_sensitive(True)
+
+        # Full-text search
+        self.search_panel = search.SearchPanel(doc, self.on_search_select)
+        self.p_box.pack_start(self.search_panel.widget, True, True, 0)
+        self.search_action.set_sensitive(True)
+
+        self.update_widget_types()
+        self.attach_outline()
+        self.attach_page_labels()
+
+        # Use notes mode by default if the document has notes (toggling the
+        # action calls switch_mode, which displays the page)
+        if self.notes_action.get_active() != doc.has_notes():
+            self.notes_action.set_active(doc.has_notes())
+        else:
+            self.on_page_change(False, False)
+
     def run(self):
         """Run the GTK main loop."""
         Gtk.main()
@@ -337,27 +535,42 @@ class UI:
         about.run()
         about.destroy()
 
-    def on_page_change(self, unpause=True):
+    def on_page_change(self, unpause=True, navigation=True):
         """
         Switch to another page and display it.
 
         This is a kind of event which is supposed to be called only from the
         :class:`~pympress.document.Document` class.
 
+        Page changes coming in a burst (held key, fast scrolling) are coalesced:
+        only the page numbers and the pages that are already cached are
+        updated, and the pages are fully displayed by :meth:`on_page_settle`
+        once no page change happened for :attr:`settle_delay` milliseconds.
+
         :param unpause: ``True`` if the page change should unpause the timer,
            ``False`` otherwise
         :type  unpause: boolean
+        :param navigation: ``False`` if the display changed for another reason
+           than navigation (e.g. a change of mode), so that it is never
+           coalesced with page changes
+        :type  navigation: boolean
         """
+        start = time.perf_counter()
+        burst = navigation and start - self.last_page_change < self.settle_delay / 1000
+        if navigation:
+            self.last_page_change = start
+
         page_cur = self.doc.current_page()
         page_next = self.doc.next_page()
 
         # Aspect ratios
-        pr = page_cur.get_aspect_ratio(self.notes_mode)
+        pr = page_cur.get_aspect_ratio(self.cache.get_widget_type("c_da"))
         self.c_frame.set_property("ratio", pr)
+        pr = page_cur.get_aspect_ratio(self.cache.get_widget_type("p_da_cur"))
         self.p_frame_cur.set_property("ratio", pr)
 
         if page_next is not None:
-            pr = page_next.get_aspect_ratio(self.notes_mode)
+            pr = page_next.get_aspect_ratio(self.cache.get_widget_type("p_da_next"))
             self.p_frame_next.set_property("ratio", pr)
 
         # Start counter if needed
@@ -365,34 +578,122 @@ class UI:
             self.paused = False
             if self.start_time == 0:
                 self.start_time = time.time()
+                self.update_time()
+                self.schedule_clock()
 
         # Update display
         self.update_page_numbers()
+        self.update_section()
+
+        # Links moved with the pages
+        self.hit_maps = {}
+
+        if self.overview.widget.get_visible():
+            self.overview.da.queue_draw()
+
+        if self.settle_source is not None:
+            GLib.source_remove(self.settle_source)
+            self.settle_source = None
+
+        if burst:
+            # Intermediate page: only show what is already rendered
+            self.on_expose(self.c_da, cached_only=True)
+            self.on_expose(self.p_da_cur, cached_only=True)
+            self.on_expose(self.p_da_next, cached_only=True)
+            self.settle_source = GLib.timeout_add(self.settle_delay, self.on_page_settle)
+        else:
+            self.on_page_settle()
+
+        self.stats["on_page_change"].add(time.perf_counter() - start)
+
+    def on_page_settle(self):
+        """
+        Prerender the pages around the current one and display it, once
+        navigation settled.
+
+        :return: ``False``, so that this timeout callback is only called once
+        :rtype: boolean
+        """
+        self.settle_source = None
+        cur = self.doc.current_page().number()
+
+        # Prerender the 4 next pages and the 2 previous ones. The current page
+        # comes last: if it is not cached yet, drawing it below requests it
+        # before all the others.
+        page_max = min(self.doc.pages_number() - 1, cur + 5)
+        page_min = max(0, cur - 2)
+        priority = list(range(cur + 1, page_max + 1)) + list(range(cur - 1, page_min - 1, -1))
+        self.cache.prerender(page_min, page_max, priority)
 
         # Don't queue draw event but draw directly (faster)
         self.on_expose(self.c_da)
         self.on_expose(self.p_da_cur)
         self.on_expose(self.p_da_next)
+        return False
 
-        # Prerender the 4 next pages and the 2 previous ones
-        cur = page_cur.number()
-        page_max = min(self.doc.pages_number(), cur + 5)
-        page_min = max(0, cur - 2)
+    def on_document_reload(self, changed):
+        """
+        Update the display after the document was reloaded from disk.
+
+        This is a kind of event which is supposed to be called only from the
+        :class:`~pympress.document.Document` class.
 
-    def on_expose(self, widget, event=None):
+        :param changed: numbers of the pages that changed in the file
+        :type  changed: set of integers
+        """
+        self.cache.invalidate(changed)
+        self.overview.thumbnails.invalidate(changed)
+        self.displayed.clear()
+        self.painted.clear()
+        if self.overview.widget.get_visible():
+            # Pages may have been added or removed
+            self.overview.layout()
+        self.attach_outline()
+        self.attach_page_labels()
+        self.on_page_change(False, False)
+
+    def on_page_rendered(self, key):
+        """
+        Redraw the widgets showing a page whose full rendering just arrived in
+        the cache, in place of its draft.
+
+        :param key: page number, width, height and type of the rendered page
+        :type  key: tuple
+        :return: ``False``, so that this idle callback is only called once
+        :rtype: boolean
+        """
+        if self.doc is None:
+            return False
+
+        page_cur = self.doc.current_page().number()
+        page_next = page_cur + 1
+        for widget, page_nb in [(self.c_da, page_cur), (self.p_da_cur, page_cur),
+                                (self.p_da_next, page_next)]:
+            if page_nb == key[0]:
+                widget.queue_draw()
+        return False
+
+    def on_expose(self, widget, cr=None, cached_only=False):
         """
         Manage expose events for both windows.
 
-        This callback may be called either directly on a page change or as an
-        event handler by GTK. In both cases, it determines which widget needs to
-        be updated, and updates it.
+        This callback may be called either directly on a page change or as a
+        ``draw`` signal handler by GTK. In both cases, it determines which
+        widget needs to be updated, and updates it.
 
         :param widget: the widget to update
         :type  widget: :class:`Gtk.Widget`
-        :param event: the GTK event (or ``None`` if called directly)
-        :type  event: :class:`Gdk.Event`
+        :param cr: the Cairo context to draw on (or ``None`` if called directly)
+        :type  cr: :class:`cairo.Context`
+        :param cached_only: ``True`` to leave the widget unchanged rather than
+           render the page if it is not in the cache
+        :type  cached_only: boolean
         """
 
+        # Nothing to draw yet besides the black background
+        if self.doc is None:
+            return
+
         if widget in [self.c_da, self.p_da_cur]:
             # Current page
             page = self.doc.current_page()
@@ -408,12 +709,13 @@ class UI:
                 widget.show_all()
                 parent.set_shadow_type(Gtk.ShadowType.IN)
 
-        self.render_page(page, widget,)
-        window = widget.get_window()
-        ww, wh = window.get_width(), window.get_height()
-        pb = GdkPixbuf.Pixbuf()
-        pb.new(GdkPixbuf.Colorspace.RGB, False, 8, ww, wh)
-        Gdk.pixbuf_get_from_window(window, 0, 0, ww, wh)
+        # Don't render intermediate pages while navigating quickly
+        if self.settle_source is not None:
+            cached_only = True
+
+        start = time.perf_counter()
+        self.render_page(page, widget, cr, cached_only)
+        self.stats[widget.get_name()].add(time.perf_counter() - start)
 
     def on_navigation(self, widget, event):
         """
@@ -424,10 +726,36 @@ class UI:
         :param event: the event that occured
         :type  event: :class:`Gdk.Event`
         """
+        # Only allow quitting until the document is loaded
+        if self.doc is None:
+            if event.type == Gdk.EventType.KEY_PRESS \
+                    and Gdk.keyval_name(event.keyval).upper() == "Q":
+                Gtk.main_quit()
+            return False
+
         if event.type == Gdk.EventType.KEY_PRESS:
             name = Gdk.keyval_name(event.keyval)
 
-            if name in ["Right", "Down", "Page_Down", "space"]:
+            # Keys typed in the search panel are not shortcuts
+            if self.search_panel.has_focus():
+                if name == "Escape":
+                    self.close_search()
+                    return True
+                return widget.propagate_key_event(event)
+
+            # Neither are the keys moving in the outline
+            focus = widget.get_focus() if isinstance(widget, Gtk.Window) else None
+            if focus is not None and (focus is self.outline_expander
+                                      or focus.is_ancestor(self.outline_expander)):
+                if name == "Escape":
+                    widget.set_focus(None)
+                    return True
+                return widget.propagate_key_event(event)
+
+            if name.upper() == "F" and event.state & Gdk.ModifierType.CONTROL_MASK:
+                self.open_search()
+                return True
+            elif name in ["Right", "Down", "Page_Down", "space"]:
                 self.doc.goto_next()
             elif name in ["Left", "Up", "Page_Up", "BackSpace"]:
                 self.doc.goto_prev()
@@ -439,12 +767,16 @@ class UI:
                 or (name == "Return" and event.state & Gdk.ModifierType.MOD1_MASK) \
                 or (name.upper() == "L" and event.state & Gdk.ModifierType.CONTROL_MASK):
                 self.switch_fullscreen()
+            elif name == "Escape" and self.overview_action.get_active():
+                self.overview_action.set_active(False)
             elif name.upper() == "Q":
                 Gtk.main_quit()
             elif name == "Pause":
                 self.switch_pause()
             elif name.upper() == "R":
                 self.reset_timer()
+            elif name.upper() == "H":
+                self.switch_hud()
 
             # Some key events are already handled by toggle actions in the
             # presenter window, so we must handle them in the content window
@@ -454,57 +786,114 @@ class UI:
                     self.switch_pause()
                 elif name.upper() == "N":
                     self.switch_mode()
+                elif name.upper() == "G":
+                    self.overview_action.set_active(not self.overview_action.get_active())
 
-        elif event.type == Gdk.EventScroll:
-            if event.direction in [Gdk.ScrollDirection.RIGHT, Gdk.ScrollDirection.LEFT]:
+        elif event.type == Gdk.EventType.SCROLL:
+            if event.direction in [Gdk.ScrollDirection.RIGHT, Gdk.ScrollDirection.DOWN]:
                 self.doc.goto_next()
-            else:
+            elif event.direction in [Gdk.ScrollDirection.LEFT, Gdk.ScrollDirection.UP]:
                 self.doc.goto_prev()
 
         else:
             print("Unknown event %s" % event.type)
 
-    def on_link(self, widget, event):
+    def on_resize(self, widget, allocation):
         """
-        Manage events related to hyperlinks.
+        Forget the link hit map of a drawing area when it is resized.
 
-        :param widget: the widget in which the event occured
+        :param widget: the resized widget
         :type  widget: :class:`Gtk.Widget`
-        :param event: the event that occured
-        :type  event: :class:`Gdk.Event`
+        :param allocation: the new allocation of the widget
+        :type  allocation: :class:`Gdk.Rectangle`
         """
+        self.hit_maps.pop(widget.get_name(), None)
 
-        # Where did the event occur?
-        if widget is self.p_da_next:
+    def get_hit_map(self, widget):
+        """
+        Get the link hit map of a drawing area, in widget pixel coordinates,
+        building it if the page or the widget size changed.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :return: the links of the displayed page, or ``None`` if no page is
+           displayed
+        :rtype: :class:`~pympress.document.LinkIndex`
+        """
+        if self.doc is None:
+            return None
+        elif widget is self.p_da_next:
             page = self.doc.next_page()
             if page is None:
-                return
+                return None
         else:
             page = self.doc.current_page()
 
-        # Normalize event coordinates and get link
-        x, y = event.get_coords()
         window = widget.get_window()
-        ww, wh = ww, wh = window.get_width(), window.get_height()
-        x2, y2 = x/ww, y/wh
-        link = page.get_link_at(x2, y2)
+        ww, wh = window.get_width(), window.get_height()
+
+        name = widget.get_name()
+        hit_map = self.hit_maps.get(name)
+        if hit_map is None or hit_map[:3] != (page.number(), ww, wh):
+            wtype = self.cache.get_widget_type(name)
+            hit_map = (page.number(), ww, wh, page.get_hit_map(ww, wh, wtype))
+            self.hit_maps[name] = hit_map
+        return hit_map[3]
+
+    def on_link(self, widget, event):
+        """
+        Manage events related to hyperlinks.
+
+        Motion events are coalesced: only the last one is handled, once GTK is
+        idle (see :meth:`on_motion_idle`).
+
+        :param widget: the widget in which the event occured
+        :type  widget: :class:`Gtk.Widget`
+        :param event: the event that occured
+        :type  event: :class:`Gdk.Event`
+        """
 
         # Event type?
         if event.type == Gdk.EventType.BUTTON_PRESS:
+            hit_map = self.get_hit_map(widget)
+            if hit_map is None:
+                return
+            x, y = event.get_coords()
+            link = hit_map.find(x, y)
             if link is not None:
                 dest = link.get_destination()
                 self.doc.goto(dest)
 
         elif event.type == Gdk.EventType.MOTION_NOTIFY:
-            if link is not None:
-                cursor = Gdk.Cursor(Gdk.HAND2)
-                window.set_cursor(cursor)
-            else:
-                window.set_cursor(None)
+            x, y = event.get_coords()
+            if self.pending_motion is None:
+                GLib.idle_add(self.on_motion_idle)
+            self.pending_motion = (widget, x, y)
 
         else:
             print("Unknown event %s" % event.type)
 
+    def on_motion_idle(self):
+        """
+        Handle the last pointer motion event: update the cursor if the pointer
+        entered or left a link.
+
+        :return: ``False`` (to run only once)
+        :rtype: boolean
+        """
+        widget, x, y = self.pending_motion
+        self.pending_motion = None
+
+        hit_map = self.get_hit_map(widget)
+        hover = hit_map is not None and hit_map.find(x, y) is not None
+
+        name = widget.get_name()
+        if self.link_hover.get(name, False) != hover:
+            self.link_hover[name] = hover
+            widget.get_window().set_cursor(self.hand_cursor if hover else None)
+
+        return False
+
     def on_label_event(self, widget, event):
         """
         Manage events on the current slide label/entry.
@@ -520,12 +909,13 @@ class UI:
         """
 
         widget = self.eb_cur.get_child()
+        if self.doc is None:
+            return
 
         # Click on the label
         if widget is self.label_cur and event.type == Gdk.EventType.BUTTON_PRESS:
             # Set entry text
-            self.entry_cur.set_text("%d/%d" % (self.doc.current_page().number()+1,
-                                        self.doc.pages_number()))
+            self.entry_cur.set_text(self.page_number_text(self.doc.current_page().number()))
             self.entry_cur.select_region(0, -1)
 
             # Replace label with entry
@@ -543,15 +933,16 @@ class UI:
                 text = self.entry_cur.get_text()
                 self.restore_current_label()
 
-                # Deal with the text
-                n = self.doc.current_page().number() + 1
-                try:
-                    s = text.split('/')[0]
-                    n = int(s)
-                except ValueError:
-                    print("Invalid number: %s" % text)
+                # Deal with the text: a page label, or else a page number
+                s = text.split('/')[0].strip()
+                n = self.doc.page_labels.find(s)
+                if n is None:
+                    n = self.doc.current_page().number()
+                    try:
+                        n = int(s) - 1
+                    except ValueError:
+                        print("Invalid page: %s" % text)
 
-                n -= 1
                 if n != self.doc.current_page().number():
                     if n <= 0:
                         n = 0
@@ -566,18 +957,28 @@ class UI:
         # Propagate the event further
         return False
 
-    def render_page(self, page, widget):
+    def render_page(self, page, widget, cr=None, cached_only=False):
         """
         Render a page on a widget.
 
         This function takes care of properly initializing the widget so that
-        everything looks fine in the end. The rendering to a Cairo surface is
-        done using the :meth:`pympress.document.Page.render_cairo` method.
+        everything looks fine in the end. The page is fetched from the
+        :class:`~pympress.pixbufcache.PixbufCache`. If it has not been
+        prerendered yet, a quick draft is displayed instead and the full
+        rendering is requested in the background: the widget is redrawn by
+        :meth:`on_page_rendered` once it is ready.
 
         :param page: the page to render
         :type  page: :class:`pympress.document.Page`
         :param widget: the widget on which the page must be rendered
         :type  widget: :class:`Gtk.DrawingArea`
+        :param cr: the Cairo context provided by a ``draw`` signal, or ``None``
+           to draw directly on the widget window
+        :type  cr: :class:`cairo.Context`
+        :param cached_only: ``True`` to only display the page if a rendering of
+           it (possibly at another size) is in the cache; otherwise the widget
+           keeps showing the previous page
+        :type  cached_only: boolean
         """
 
         # Make sure the widget is initialized
@@ -585,8 +986,42 @@ class UI:
         if not window:
             return
 
-        # Widget size
+        # Widget size, and the number of device pixels per logical pixel: pages
+        # are rendered and cached at the size of the widget in device pixels
         ww, wh = window.get_width(), window.get_height()
+        scale = widget.get_scale_factor()
+
+        # Fetch the rendered page
+        name = widget.get_name()
+        self.cache.set_size(name, ww * scale, wh * scale)
+        surface = self.cache.lookup(name, page.number())
+        final = surface is not None
+        if surface is None and cached_only:
+            surface = self.cache.draft(name, page.number(), render=False)
+        elif surface is None:
+            surface = self.cache.draft(name, page.number())
+            self.cache.request(name, page.number())
+        if surface is None and cr is not None:
+            # GTK cleared the widget: show the previous page again rather than
+            # nothing, until the burst settles
+            surface = self.painted.get(name)
+        if surface is None:
+            self.displayed[name] = None
+            return
+        self.painted[name] = surface
+
+        shown = self.displayed.get(name)
+        spec = (surface.get_width(), surface.get_height(), self.cache.get_widget_type(name))
+        self.displayed[name] = (page.number(),) + spec if final else None
+
+        # Called from a draw signal: GTK already takes care of double buffering
+        if cr is not None:
+            # Only a full paint leaves the whole widget showing this page
+            x1, y1, x2, y2 = cr.clip_extents()
+            if x1 > 0 or y1 > 0 or x2 < ww or y2 < wh:
+                self.displayed[name] = None
+            self.paint_surface(cr, surface, scale)
+            return
 
         # Manual double buffering (since we use direct drawing instead of
         # calling queue_draw() on the widget)
@@ -595,14 +1030,56 @@ class UI:
         rect.y = 0
         rect.width = ww
         rect.height = wh
+
+        # Only repaint the region that differs from the previous page, e.g.
+        # between the overlays of a Beamer frame
+        if final and shown is not None and shown[1:] == spec:
+            damage = self.cache.get_damage(name, shown[0], page.number())
+            if damage is not None:
+                x, y, w, h = damage
+                if w == 0 or h == 0:
+                    return
+                rect.x, rect.y = x // scale, y // scale
+                rect.width = -(-(x + w) // scale) - rect.x
+                rect.height = -(-(y + h) // scale) - rect.y
+
         window.begin_paint_rect(rect)
 
         cr = window.cairo_create()
-        page.render_cairo(cr, ww, wh)
+        self.paint_surface(cr, surface, scale)
 
         # Blit off-screen buffer to screen
         window.end_paint()
 
+    def paint_surface(self, cr, surface, scale):
+        """
+        Paint a rendered page on a widget, one surface pixel per device pixel.
+
+        :param cr: the Cairo context of the widget, in logical pixels
+        :type  cr: :class:`cairo.Context`
+        :param surface: the rendered page, in device pixels
+        :type  surface: :class:`cairo.ImageSurface`
+        :param scale: scale factor of the widget
+        :type  scale: integer
+        """
+        cr.scale(1. / scale, 1. / scale)
+        cr.set_source_surface(surface, 0, 0)
+        cr.paint()
+
+    def on_scale_change(self, widget, pspec):
+        """
+        Redraw a drawing area after its scale factor changed (e.g. its window
+        was moved to a monitor with another pixel density). Only the cached
+        pages of this widget are rendered again, at its new size in device
+        pixels, the next time it is drawn.
+
+        :param widget: the drawing area
+        :type  widget: :class:`Gtk.DrawingArea`
+        :param pspec: the ``scale-factor`` property
+        :type  pspec: :class:`GObject.ParamSpec`
+        """
+        widget.queue_draw()
+
     def restore_current_label(self):
         """
         Make sure that the current page number is displayed in a label and not
@@ -613,45 +1090,167 @@ class UI:
             self.eb_cur.remove(child)
             self.eb_cur.add(self.label_cur)
 
+    def attach_outline(self):
+        """
+        Display the outline of the document once it is read.
+        """
+        outline = self.doc.outline
+        outline.on_ready = lambda: GLib.idle_add(self.on_outline_ready, outline)
+        if outline.ready.is_set():
+            self.on_outline_ready(outline)
+
+    def on_outline_ready(self, outline):
+        """
+        Fill the outline panel, and show the current section.
+
+        :param outline: the outline that was read
+        :type  outline: :class:`~pympress.document.Outline`
+        :return: ``False``, so that this idle callback is only called once
+        :rtype: boolean
+        """
+        if outline is not self.doc.outline or outline is self.outline_shown:
+            return False
+        self.outline_shown = outline
+
+        self.outline_store.clear()
+        parents = []
+        for title, depth, page in outline.entries:
+            parent = parents[depth - 1] if depth > 0 else None
+            parents[depth:] = [self.outline_store.append(parent, [title, -1 if page is None else page])]
+
+        if outline.entries:
+            self.outline_expander.show_all()
+        else:
+            self.outline_expander.hide()
+        self.update_section()
+        return False
+
+    def on_outline_activated(self, view, path, column):
+        """
+        Go to the page of the activated outline entry.
+
+        :param view: the outline view
+        :type  view: :class:`Gtk.TreeView`
+        :param path: path of the activated row
+        :type  path: :class:`Gtk.TreePath`
+        :param column: activated column
+        :type  column: :class:`Gtk.TreeViewColumn`
+        """
+        page_nb = self.outline_store[path][1]
+        if page_nb >= 0:
+            self.doc.goto(page_nb)
+
+    def update_section(self):
+        """Display the title of the section containing the current page."""
+        outline = self.outline_shown
+        text = ""
+        if outline is not None and outline is self.doc.outline:
+            i = outline.section(self.doc.current_page().number())
+            if i is not None:
+                text = outline.paths[i]
+
+        if text != self.label_section.get_text():
+            self.label_section.set_text(text)
+
+    def attach_page_labels(self):
+        """
+        Display the page labels of the document once they are read.
+        """
+        labels = self.doc.page_labels
+        labels.on_ready = lambda: GLib.idle_add(self.on_page_labels_ready, labels)
+        if labels.ready.is_set():
+            self.on_page_labels_ready(labels)
+
+    def on_page_labels_ready(self, labels):
+        """
+        Display the page labels instead of the page numbers.
+
+        :param labels: the labels that were read
+        :type  labels: :class:`~pympress.document.PageLabels`
+        :return: ``False``, so that this idle callback is only called once
+        :rtype: boolean
+        """
+        if labels is self.doc.page_labels:
+            self.update_page_numbers()
+        return False
+
+    def page_number_text(self, number):
+        """
+        Get the text showing the position of a page in the document: its label
+        and the label of the last page (which are the page numbers if the
+        document has no labels).
+
+        :param number: number of the page
+        :type  number: integer
+        :return: text such as ``"12/87"``
+        :rtype: string
+        """
+        labels = self.doc.page_labels
+        return "%s/%s" % (labels.label(number), labels.label(self.doc.pages_number() - 1))
+
     def update_page_numbers(self):
         """Update the displayed page numbers."""
 
         text = "<span font='36'>%s</span>"
 
         cur_nb = self.doc.current_page().number()
-        cur = "%d/%d" % (cur_nb + 1, self.doc.pages_number())
+        cur = self.page_number_text(cur_nb)
         next = "--"
         if cur_nb + 2 <= self.doc.pages_number():
-            next = "%d/%d" % (cur_nb + 2, self.doc.pages_number())
+            next = self.page_number_text(cur_nb + 1)
 
-        self.label_cur.set_markup(text % cur)
-        self.label_next.set_markup(text % next)
+        self.label_cur.set_markup(text % GLib.markup_escape_text(cur))
+        self.label_next.set_markup(text % GLib.markup_escape_text(next))
         self.restore_current_label()
 
     def update_time(self):
         """
-        Update the timer and clock labels.
-
-        :return: ``True`` (to prevent the timer from stopping)
-        :rtype: boolean
+        Update the timer and clock labels, if their text changed.
         """
-
-        text = "<span font='36'>%s</span>"
+        now = time.time()
 
         # Current time
-        clock = time.strftime("%H:%M:%S")
+        clock = time.strftime("%H:%M:%S", time.localtime(now))
 
         # Time elapsed since the beginning of the presentation
         if not self.paused:
-            self.delta = time.time() - self.start_time
+            self.delta = now - self.start_time
         elapsed = "%02d:%02d" % (int(self.delta/60), int(self.delta % 60))
         if self.paused:
             elapsed += " (pause)"
 
-        self.label_time.set_markup(text % elapsed)
-        self.label_clock.set_markup(text % clock)
+        if elapsed != self.time_text:
+            self.time_text = elapsed
+            self.label_time.set_text(elapsed)
+        if clock != self.clock_text:
+            self.clock_text = clock
+            self.label_clock.set_text(clock)
 
-        return True
+    def schedule_clock(self):
+        """
+        Schedule the next update of the timer and clock right after the next
+        second boundary of either the wall clock or the running timer, so that
+        both labels change exactly when their text does.
+        """
+        if self.clock_source is not None:
+            GLib.source_remove(self.clock_source)
+        now = time.time()
+        delay = 1 - now % 1
+        if not self.paused and self.start_time != 0:
+            delay = min(delay, 1 - (now - self.start_time) % 1)
+        self.clock_source = GLib.timeout_add(int(delay * 1000) + 5, self.on_clock_tick)
+
+    def on_clock_tick(self):
+        """
+        Update the timer and clock, then schedule the next update.
+
+        :return: ``False``, since a new timeout is scheduled for the next update
+        :rtype: boolean
+        """
+        self.clock_source = None
+        self.update_time()
+        self.schedule_clock()
+        return False
 
     def switch_pause(self, widget=None, event=None):
         """Switch the timer between paused mode and running (normal) mode."""
@@ -661,11 +1260,13 @@ class UI:
         else:
             self.paused = True
         self.update_time()
+        self.schedule_clock()
 
     def reset_timer(self, widget=None, event=None):
         """Reset the timer."""
         self.start_time = time.time()
         self.update_time()
+        self.schedule_clock()
 
     def switch_fullscreen(self, widget=None, event=None):
         """
@@ -688,4 +1289,134 @@ class UI:
         else:
             self.notes_mode = True
 
-        self.on_page_change(False)
+        if self.doc is not None:
+            self.update_widget_types()
+            self.on_page_change(False, False)
+
+    def update_widget_types(self):
+        """
+        Set the type of document displayed by each drawing area: the slides in
+        the Content window and in the "Next slide" preview, and the notes in
+        the "Current slide" preview in notes mode, the whole pages otherwise.
+        The content and notes halves are cached separately.
+        """
+        if self.notes_mode:
+            types = {"c_da": PDF_CONTENT_PAGE, "p_da_cur": PDF_NOTES_PAGE,
+                     "p_da_next": PDF_CONTENT_PAGE}
+        else:
+            types = {"c_da": PDF_REGULAR, "p_da_cur": PDF_REGULAR, "p_da_next": PDF_REGULAR}
+
+        for name, wtype in types.items():
+            self.cache.set_widget_type(name, wtype)
+        self.overview.set_type(types["c_da"])
+
+    def switch_overview(self, widget=None, event=None):
+        """
+        Switch the Presenter window between its usual content and the overview
+        grid of all the pages.
+        """
+        if self.overview.widget.get_visible():
+            self.overview.hide()
+            self.p_table.show()
+        else:
+            self.close_search()
+            height = self.p_table.get_allocated_height()
+            self.p_table.hide()
+            self.overview.show(height)
+
+    def on_overview_select(self, page_nb):
+        """
+        Go to a page chosen in the overview grid, and close the grid.
+
+        :param page_nb: number of the chosen page
+        :type  page_nb: integer
+        """
+        self.overview_action.set_active(False)
+        self.doc.goto(page_nb)
+
+    def open_search(self, widget=None, event=None):
+        """
+        Show the search panel in place of the usual content of the Presenter
+        window, and focus its entry.
+        """
+        if self.search_panel.widget.get_visible():
+            self.search_panel.entry.grab_focus()
+            return
+
+        self.overview_action.set_active(False)
+        height = self.p_table.get_allocated_height()
+        self.p_table.hide()
+        self.search_panel.show(height)
+        self.search_panel.widget.get_toplevel().present()
+
+    def close_search(self):
+        """Hide the search panel, if it is shown."""
+        if self.search_panel.widget.get_visible():
+            self.search_panel.hide()
+            self.p_table.show()
+
+    def on_search_select(self, page_nb):
+        """
+        Go to a page chosen in the search results, and close the search panel.
+
+        :param page_nb: number of the chosen page
+        :type  page_nb: integer
+        """
+        self.close_search()
+        self.doc.goto(page_nb)
+
+    def switch_hud(self, widget=None, event=None):
+        """Show or hide the performance HUD of the Presenter window."""
+        if self.hud.get_visible():
+            self.hud.hide()
+            if self.hud_source is not None:
+                GLib.source_remove(self.hud_source)
+                self.hud_source = None
+        else:
+            self.hud.show()
+            self.update_hud()
+            self.hud_source = GLib.timeout_add(500, self.update_hud)
+
+    def update_hud(self):
+        """
+        Update the performance HUD with the render times, the time spent
+        switching pages and the usage of the caches.
+
+        :return: ``True`` while the HUD is visible (to keep the timer running)
+        :rtype: boolean
+        """
+        if not self.hud.get_visible():
+            self.hud_source = None
+            return False
+
+        lines = ["%-14s %8s %8s" % ("", "last", "p95")]
+        for name in ["c_da", "p_da_cur", "p_da_next", "on_page_change"]:
+            stats = self.stats[name]
+            lines.append("%-14s %6.1fms %6.1fms" % (name, stats.last * 1000,
+                                                     stats.percentile(95) * 1000))
+
+        if self.doc is not None:
+            count, size = self.cache.memory_usage()
+            total = self.cache.hits + self.cache.misses
+            lines.append("surfaces: %d, %.1f MB, %d%% hits" % (count, size / 1048576.,
+                         100 * self.cache.hits / total if total else 0))
+
+            count, size = self.overview.thumbnails.memory_usage()
+            lines.append("thumbnails: %d, %.1f MB" % (count, size / 1048576.))
+
+            pages = self.doc.cache_stats()
+            total = pages["hits"] + pages["misses"]
+            lines.append("pages: %d/%d, %d%% hits, %d evicted" % (pages["size"],
+                         pages["max_size"], 100 * pages["hits"] / total if total else 0,
+                         pages["evictions"]))
+
+        # Poppler does not tell how much memory a page uses: the resident
+        # memory of the process is the closest measure of the pages cache
+        rss = util.resident_memory()
+        if rss is not None:
+            lines.append("resident: %.1f MB" % (rss / 1048576.))
+
+        text = GLib.markup_escape_text("\n".join(lines))
+        self.hud.set_markup("<span font_family='monospace' background='black' "
+                            "foreground='white'>%s</span>" % text)
+        return True
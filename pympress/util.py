@@ -23,11 +23,11 @@
 -------------------------------------------------
 """
 
+import collections
 import glob
 import os, os.path
-from gi.repository import Poppler
-from gi.repository.GdkPixbuf import Pixbuf
-import os
+import sys
+import time
 
 
 def load_icons():
@@ -38,6 +38,7 @@ def load_icons():
     :return: loaded icons
     :rtype: list of :class:`Gtk.gdk.Pixbuf`
     """
+    from gi.repository.GdkPixbuf import Pixbuf
 
     # If pkg_resources fails, load from directory
     icon_path = "/usr/share/pixmaps/"
@@ -66,6 +67,7 @@ def poppler_links_available():
        ``False`` otherwise
     :rtype: boolean
     """
+    from gi.repository import Poppler
 
     try:
         type(Poppler.ActionGotoDest)
@@ -73,3 +75,102 @@ def poppler_links_available():
         return False
     else:
         return True
+
+
+def resident_memory():
+    """Get the memory of the process which is resident in RAM, including the
+    memory used by Poppler.
+
+    :return: resident memory in bytes, or ``None`` if it is not known (on
+       systems without :file:`/proc`)
+    :rtype: integer
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PhaseTimer:
+    """
+    Measure how long the successive phases of a process (e.g. startup) take.
+    """
+
+    #: Name and duration in seconds of the finished phases, as a list of tuples
+    phases = []
+    #: Time at which the current phase started
+    start = 0.
+
+    def __init__(self):
+        self.phases = []
+        self.start = time.perf_counter()
+
+    def mark(self, name):
+        """
+        End the current phase and start the next one.
+
+        :param name: name of the phase that just ended
+        :type  name: string
+        """
+        now = time.perf_counter()
+        self.phases.append((name, now - self.start))
+        self.start = now
+
+    def report(self, out=sys.stderr):
+        """
+        Print the duration of every phase, and the total.
+
+        :param out: file to print to
+        :type  out: file object
+        """
+        total = 0.
+        for name, duration in self.phases:
+            total += duration
+            print("%-24s %8.1f ms" % (name, duration * 1000), file=out)
+        print("%-24s %8.1f ms" % ("total", total * 1000), file=out)
+
+
+class RollingStats:
+    """
+    Keep the durations of the last occurrences of an operation. Recording a
+    duration is cheap enough to be left on permanently; percentiles are only
+    computed when asked for.
+    """
+
+    #: Last recorded durations, in seconds
+    samples = None
+    #: Last recorded duration, in seconds
+    last = 0.
+
+    def __init__(self, size=100):
+        """
+        :param size: number of durations to keep
+        :type  size: integer
+        """
+        self.samples = collections.deque(maxlen=size)
+        self.last = 0.
+
+    def add(self, duration):
+        """
+        Record a duration.
+
+        :param duration: duration in seconds
+        :type  duration: float
+        """
+        self.last = duration
+        self.samples.append(duration)
+
+    def percentile(self, p):
+        """
+        Get a percentile of the recorded durations.
+
+        :param p: the percentile to compute, between 0 and 100
+        :type  p: float
+        :return: the duration in seconds (0 if nothing was recorded)
+        :rtype: float
+        """
+        if not self.samples:
+            return 0.
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100.))]
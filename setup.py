@@ -46,9 +46,14 @@ setup(name="pympress",
           'Topic :: Multimedia :: Graphics :: Viewers',
       ],
       packages=["pympress"],
+      extras_require={
+          # Finds the exact region that changed between two pages
+          "damage": ["numpy"],
+      },
     entry_points={
         'console_scripts': [
             'pympress = pympress.main:main',
+            'pympress-bench = pympress.bench:main',
         ],
     },
 